@@ -23,6 +23,12 @@ if config.config_file_name is not None:
 # target_metadata = mymodel.Base.metadata
 target_metadata = SQLModel.metadata
 
+
+def include_name(name, type_, parent_names) -> bool:
+    """Skips the FTS5 search tables (and their shadow tables), managed by hand in the migrations."""
+    return not (type_ == "table" and "_fts" in name)
+
+
 # other values from the config, defined by the needs of env.py,
 # can be acquired:
 # my_important_option = config.get_main_option("my_important_option")
@@ -45,6 +51,7 @@ def run_migrations_offline() -> None:
     context.configure(
         url=url,
         target_metadata=target_metadata,
+        include_name=include_name,
         literal_binds=True,
         dialect_opts={"paramstyle": "named"},
     )
@@ -70,6 +77,7 @@ def run_migrations_online() -> None:
         context.configure(
             connection=connection,
             target_metadata=target_metadata,
+            include_name=include_name,
             transaction_per_migration=True,  # Ejecutar cada migración en su propia transacción
             render_as_batch=True  # Necesario para SQLite
         )
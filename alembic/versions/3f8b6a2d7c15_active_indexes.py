@@ -0,0 +1,39 @@
+"""Active indexes
+
+Revision ID: 3f8b6a2d7c15
+Revises: e4a7c1d83b52
+Create Date: 2026-10-18 16:42:37.903154
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3f8b6a2d7c15'
+down_revision: Union[str, None] = 'e4a7c1d83b52'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# Partial indexes over the active rows backing the range filters and sorts of the list endpoints.
+INDEXES = {
+    'players': (('birthdate',), ('height',), ('dorsal',), ('team_id', 'dorsal')),
+    'teams': (('name',),),
+}
+
+
+def upgrade() -> None:
+    for table, indexes in INDEXES.items():
+        for columns in indexes:
+            op.create_index(f"ix_{table}_active_{'_'.join(columns)}", table, list(columns), unique=False,
+                            sqlite_where=sa.text('is_active = 1'))
+
+
+def downgrade() -> None:
+    for table, indexes in INDEXES.items():
+        for columns in indexes:
+            op.drop_index(f"ix_{table}_active_{'_'.join(columns)}", table_name=table)
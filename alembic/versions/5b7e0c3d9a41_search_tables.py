@@ -0,0 +1,49 @@
+"""Search tables
+
+Revision ID: 5b7e0c3d9a41
+Revises: ed96223492c4
+Create Date: 2026-10-18 09:12:40.318211
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5b7e0c3d9a41'
+down_revision: Union[str, None] = 'ed96223492c4'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# FTS5 trigram tables over the text columns searched with contains filters.
+SEARCH_COLUMNS = {
+    'players': ('firstname', 'lastname', 'nationality', 'position'),
+    'teams': ('name', 'country', 'city', 'stadium', 'color', 'coach'),
+}
+
+
+def upgrade() -> None:
+    for table, columns in SEARCH_COLUMNS.items():
+        fts = f'{table}_fts'
+        names = ', '.join(columns)
+        new_values = ', '.join(f'new.{name}' for name in columns)
+        old_values = ', '.join(f'old.{name}' for name in columns)
+        insert_new = f"INSERT INTO {fts}(rowid, {names}) VALUES (new.id, {new_values});"
+        delete_old = f"INSERT INTO {fts}({fts}, rowid, {names}) VALUES ('delete', old.id, {old_values});"
+
+        op.execute(f"CREATE VIRTUAL TABLE {fts} USING fts5({names}, content='{table}', content_rowid='id', tokenize='trigram')")
+        op.execute(f"CREATE TRIGGER {fts}_insert AFTER INSERT ON {table} BEGIN {insert_new} END")
+        op.execute(f"CREATE TRIGGER {fts}_delete AFTER DELETE ON {table} BEGIN {delete_old} END")
+        op.execute(f"CREATE TRIGGER {fts}_update AFTER UPDATE OF {names} ON {table} BEGIN {delete_old} {insert_new} END")
+        op.execute(f"INSERT INTO {fts}({fts}) VALUES ('rebuild')")
+
+
+def downgrade() -> None:
+    for table in SEARCH_COLUMNS:
+        fts = f'{table}_fts'
+        op.execute(f"DROP TRIGGER IF EXISTS {fts}_update")
+        op.execute(f"DROP TRIGGER IF EXISTS {fts}_delete")
+        op.execute(f"DROP TRIGGER IF EXISTS {fts}_insert")
+        op.execute(f"DROP TABLE IF EXISTS {fts}")
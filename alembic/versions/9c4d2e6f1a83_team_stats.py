@@ -0,0 +1,86 @@
+"""Team stats
+
+Revision ID: 9c4d2e6f1a83
+Revises: 5b7e0c3d9a41
+Create Date: 2026-10-18 11:40:05.731902
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9c4d2e6f1a83'
+down_revision: Union[str, None] = '5b7e0c3d9a41'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# Distributions counted by team, with the SQL expression of the value of a player row.
+FACETS = {
+    'position': '{row}.position',
+    'nationality': '{row}.nationality',
+    'dorsal': 'CAST({row}.dorsal AS TEXT)',
+    'birth_year': "strftime('%Y', {row}.birthdate)",
+}
+STATS_COLUMNS = 'team_id, is_active, height, position, nationality, dorsal, birthdate'
+
+
+def add_player_sql(row: str) -> str:
+    facets = ', '.join(f"({row}.team_id, '{facet}', {value.format(row=row)}, 1)" for facet, value in FACETS.items())
+    return (f"INSERT INTO team_stats(team_id, player_count, height_sum) VALUES ({row}.team_id, 1, {row}.height) "
+            f"ON CONFLICT(team_id) DO UPDATE SET player_count = player_count + 1, height_sum = height_sum + excluded.height_sum; "
+            f"INSERT INTO team_stats_facets(team_id, facet, value, count) VALUES {facets} "
+            f"ON CONFLICT(team_id, facet, value) DO UPDATE SET count = count + 1;")
+
+
+def remove_player_sql(row: str) -> str:
+    facets = ', '.join(f"('{facet}', {value.format(row=row)})" for facet, value in FACETS.items())
+    return (f"UPDATE team_stats SET player_count = player_count - 1, height_sum = height_sum - {row}.height "
+            f"WHERE team_id = {row}.team_id; "
+            f"UPDATE team_stats_facets SET count = count - 1 WHERE team_id = {row}.team_id AND (facet, value) IN (VALUES {facets}); "
+            f"DELETE FROM team_stats_facets WHERE team_id = {row}.team_id AND count <= 0;")
+
+
+STATS_TRIGGERS = {
+    'team_stats_insert': f"AFTER INSERT ON players WHEN new.is_active BEGIN {add_player_sql('new')} END",
+    'team_stats_delete': f"AFTER DELETE ON players WHEN old.is_active BEGIN {remove_player_sql('old')} END",
+    'team_stats_update_old': f"AFTER UPDATE OF {STATS_COLUMNS} ON players WHEN old.is_active BEGIN {remove_player_sql('old')} END",
+    'team_stats_update_new': f"AFTER UPDATE OF {STATS_COLUMNS} ON players WHEN new.is_active BEGIN {add_player_sql('new')} END",
+}
+
+
+def upgrade() -> None:
+    op.create_table('team_stats',
+    sa.Column('team_id', sa.Integer(), nullable=False),
+    sa.Column('player_count', sa.Integer(), nullable=False),
+    sa.Column('height_sum', sa.Float(), nullable=False),
+    sa.PrimaryKeyConstraint('team_id')
+    )
+    op.create_table('team_stats_facets',
+    sa.Column('team_id', sa.Integer(), nullable=False),
+    sa.Column('facet', sqlmodel.sql.sqltypes.AutoString(length=20), nullable=False),
+    sa.Column('value', sqlmodel.sql.sqltypes.AutoString(length=30), nullable=False),
+    sa.Column('count', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('team_id', 'facet', 'value')
+    )
+
+    for name, definition in STATS_TRIGGERS.items():
+        op.execute(f"CREATE TRIGGER {name} {definition}")
+
+    op.execute("INSERT INTO team_stats(team_id, player_count, height_sum) "
+               "SELECT team_id, COUNT(*), SUM(height) FROM players WHERE is_active = 1 GROUP BY team_id")
+    for facet, value in FACETS.items():
+        op.execute(f"INSERT INTO team_stats_facets(team_id, facet, value, count) "
+                   f"SELECT team_id, '{facet}', {value.format(row='players')}, COUNT(*) FROM players WHERE is_active = 1 "
+                   f"GROUP BY team_id, {value.format(row='players')}")
+
+
+def downgrade() -> None:
+    for name in STATS_TRIGGERS:
+        op.execute(f"DROP TRIGGER IF EXISTS {name}")
+    op.drop_table('team_stats_facets')
+    op.drop_table('team_stats')
@@ -0,0 +1,35 @@
+"""Change feed
+
+Revision ID: e4a7c1d83b52
+Revises: 9c4d2e6f1a83
+Create Date: 2026-10-18 14:05:12.418270
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e4a7c1d83b52'
+down_revision: Union[str, None] = '9c4d2e6f1a83'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    for table in ('teams', 'players'):
+        op.add_column(table, sa.Column('updated_at', sa.DateTime(), nullable=True))
+        op.add_column(table, sa.Column('change_seq', sa.Integer(), nullable=True))
+        # Existing rows enter the change feed in ID order.
+        op.execute(f"UPDATE {table} SET change_seq = id, updated_at = strftime('%Y-%m-%d %H:%M:%f', 'now')")
+        op.create_index(op.f(f'ix_{table}_change_seq'), table, ['change_seq'], unique=False)
+
+
+def downgrade() -> None:
+    for table in ('players', 'teams'):
+        op.drop_index(op.f(f'ix_{table}_change_seq'), table_name=table)
+        op.drop_column(table, 'change_seq')
+        op.drop_column(table, 'updated_at')
@@ -0,0 +1,95 @@
+"""
+Implements the reading and validation of the request bodies received by the bulk endpoints.
+"""
+
+# Python imports.
+import json
+from fastapi import Request, status, HTTPException
+from pydantic import ValidationError
+from sqlmodel import SQLModel
+
+# Project imports.
+from .models import BulkRowError
+
+
+NDJSON_MEDIA_TYPES = ('application/x-ndjson', 'application/ndjson', 'application/jsonl')
+
+
+class InvalidLine:
+    """
+    Marks a NDJSON line that could not be decoded.
+    """
+    def __init__(self, error: ValueError):
+        self.error = error
+
+
+def bulk_openapi(schema_name: str) -> dict:
+    """
+    Documents the body of a bulk endpoint, which is read from the request instead of a Body parameter.
+    @param schema_name: Name of the OpenAPI schema of a row.
+    @return:            OpenAPI extra definitions of the route.
+    """
+    schema = {'type': 'array', 'items': {'$ref': f'#/components/schemas/{schema_name}'}}
+    content = {media_type: {'schema': schema} for media_type in ('application/json', 'application/x-ndjson')}
+    return {'requestBody': {'required': True, 'content': content}}
+
+
+async def read_bulk_rows(request: Request) -> list:
+    """
+    Reads the rows of a bulk request, sent as a JSON array or as NDJSON (one object per line).
+    @param request: Request object.
+    @return:        List with the decoded rows.
+    """
+    body = await request.body()
+    media_type = request.headers.get('content-type', '').split(';')[0].strip()
+
+    if media_type in NDJSON_MEDIA_TYPES:
+        rows = []
+        for line in body.splitlines():
+            if line.strip():
+                try:
+                    rows.append(json.loads(line))
+                except ValueError as error:
+                    rows.append(InvalidLine(error))
+        return rows
+
+    try:
+        rows = json.loads(body)
+    except ValueError:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail='Invalid JSON body')
+    if not isinstance(rows, list):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail='A JSON array is expected')
+    return rows
+
+
+def validate_bulk_rows(rows: list, model: type[SQLModel]) -> tuple[list, list[BulkRowError]]:
+    """
+    Validates every row against the model, collecting the errors by row instead of failing the whole request.
+    @param rows:    Rows decoded by read_bulk_rows.
+    @param model:   Pydantic (SQLModel) model of a row.
+    @return:        List of (index, object) of the valid rows and list of errors of the invalid rows.
+    """
+    valid, errors = [], []
+    for index, row in enumerate(rows):
+        if isinstance(row, InvalidLine):
+            errors.append(BulkRowError(index=index, detail=[{'type': 'json_invalid', 'msg': str(row.error)}]))
+            continue
+        try:
+            valid.append((index, model.model_validate(row)))
+        except ValidationError as error:
+            errors.append(BulkRowError(index=index, detail=error.errors(include_url=False, include_context=False, include_input=False)))
+    return valid, errors
+
+
+def bulk_result(valid: list, ids: dict, db_errors: dict, errors: list[BulkRowError]) -> dict:
+    """
+    Builds the response of a bulk creation mapping the database results back to the request rows.
+    @param valid:       List of (index, object) of the valid rows, in the order they were inserted.
+    @param ids:         IDs by position (in valid) of the inserted rows.
+    @param db_errors:   Error messages by position (in valid) of the rows that failed on the database.
+    @param errors:      Validation errors of the invalid rows.
+    @return:            Dictionary with the created IDs and the errors sorted by row index.
+    """
+    for position, message in db_errors.items():
+        errors.append(BulkRowError(index=valid[position][0], detail=[{'type': 'database_error', 'msg': message}]))
+    return {'ids': [ids[position] for position in sorted(ids)], 'errors': sorted(errors, key=lambda error: error.index)}
@@ -0,0 +1,91 @@
+"""
+Implements the in-process cache of entities read by ID.
+"""
+
+# Python imports.
+import time
+from collections import OrderedDict
+from threading import Lock
+from typing import Any, Callable, Hashable
+
+# Project imports.
+from settings import ENTITY_CACHE_SIZE, ENTITY_CACHE_TTL
+
+
+class EntityCache:
+    """
+    LRU cache with a time to live, safe to share between the threads of the server.
+    Entries are invalidated by the write operations of this process, so it assumes a single server process.
+    """
+
+    def __init__(self, max_size: int, ttl: float):
+        """
+        @param max_size:    Maximum number of entries, the least recently used is evicted first.
+        @param ttl:         Seconds an entry is valid after being loaded.
+        """
+        self.max_size = max_size
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries: OrderedDict[Hashable, tuple[float, Any]] = OrderedDict()
+        self._generation = 0
+        self._lock = Lock()
+
+    def get_or_load(self, key: Hashable, loader: Callable[[], Any]) -> Any:
+        """
+        Gets the value of the key, loading and storing it when it is missing or expired.
+        A value loaded while the key is invalidated is returned but not stored, so it never outlives the write.
+        @param key:     Key of the entry.
+        @param loader:  Function loading the value, None values are not stored.
+        @return:        Value of the key.
+        """
+        with self._lock:
+            if entry := self._entries.get(key):
+                expires_at, value = entry
+                if expires_at > time.monotonic():
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._entries[key]
+            self.misses += 1
+            generation = self._generation
+
+        value = loader()
+
+        if value is not None and self.max_size > 0:
+            with self._lock:
+                if self._generation == generation:
+                    self._entries[key] = (time.monotonic() + self.ttl, value)
+                    self._entries.move_to_end(key)
+                    if len(self._entries) > self.max_size:
+                        self._entries.popitem(last=False)
+        return value
+
+    def invalidate(self, key: Hashable) -> None:
+        """
+        Removes the entry of the key.
+        @param key: Key of the entry.
+        """
+        with self._lock:
+            self._entries.pop(key, None)
+            self._generation += 1
+
+    def clear(self) -> None:
+        """
+        Removes all entries.
+        """
+        with self._lock:
+            self._entries.clear()
+            self._generation += 1
+
+    def stats(self) -> dict:
+        """
+        Gets the counters of the cache.
+        @return:    Dictionary with hits, misses and current size.
+        """
+        with self._lock:
+            return {'hits': self.hits, 'misses': self.misses, 'size': len(self._entries)}
+
+
+players_cache = EntityCache(ENTITY_CACHE_SIZE, ENTITY_CACHE_TTL)
+teams_cache = EntityCache(ENTITY_CACHE_SIZE, ENTITY_CACHE_TTL)
@@ -3,20 +3,151 @@ Defines the database configuration.
 """
 
 # Python imports.
+import asyncio
+from typing import Any, Callable
+from sqlalchemy import Engine, event
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+from sqlalchemy.ext.asyncio import create_async_engine
 from sqlmodel import Session, SQLModel, create_engine
+from sqlmodel.ext.asyncio.session import AsyncSession
+from starlette.concurrency import run_in_threadpool
 
+# Project imports.
+from settings import (DATABASE_URL, DATABASE_READ_URL, DATABASE_READ_POOL_SIZE, DATABASE_READ_MAX_OVERFLOW,
+                      DATABASE_POOL_TIMEOUT, SQLITE_PRAGMAS, ASYNC_DATABASE, ASYNC_DATABASE_URL, ASYNC_DATABASE_READ_URL,
+                      GROUP_COMMIT, GROUP_COMMIT_WINDOW, GROUP_COMMIT_MAX_BATCH)
+from .group_commit import GroupCommitWriter
+from .instrumentation import instrument_engine
+from .search import create_search_tables
+from .stats import create_stats_triggers
 
-db_name = "database.db"
-sqlite_url = f"sqlite:///{db_name}"
 
 connect_args = {"check_same_thread": False}
-engine = create_engine(sqlite_url, connect_args=connect_args)
 
+# Write engine: SQLite runs one write transaction at a time, so the writes queue for a single connection
+# instead of retrying on the database lock. It also creates the tables.
+engine = create_engine(DATABASE_URL,
+                       connect_args=connect_args,
+                       pool_size=1,
+                       max_overflow=0,
+                       pool_timeout=DATABASE_POOL_TIMEOUT)
 
-def create_db_and_tables():
-    SQLModel.metadata.create_all(engine)
+# Read engine: read-only connections (mode=ro) of the GET routes. With WAL, they read the last committed
+# transaction without waiting for the write connection.
+read_engine = create_engine(DATABASE_READ_URL,
+                            connect_args=connect_args,
+                            pool_size=DATABASE_READ_POOL_SIZE,
+                            max_overflow=DATABASE_READ_MAX_OVERFLOW,
+                            pool_timeout=DATABASE_POOL_TIMEOUT)
+
+
+def set_sqlite_pragmas(dbapi_connection, connection_record):
+    """
+    Applies the configured PRAGMA statements to every new connection of the pool.
+    """
+    cursor = dbapi_connection.cursor()
+    for name, value in SQLITE_PRAGMAS.items():
+        cursor.execute(f'PRAGMA {name} = {value}')
+    cursor.close()
+
+
+def set_read_pragmas(dbapi_connection, connection_record):
+    """
+    Applies the configured PRAGMA statements to every new read-only connection, except the journal mode:
+    read-only connections cannot change it, and the WAL mode set by the write connection is kept in the file.
+    """
+    cursor = dbapi_connection.cursor()
+    for name, value in SQLITE_PRAGMAS.items():
+        if name != 'journal_mode':
+            cursor.execute(f'PRAGMA {name} = {value}')
+    cursor.close()
+
+
+event.listen(engine, 'connect', set_sqlite_pragmas)
+event.listen(read_engine, 'connect', set_read_pragmas)
+instrument_engine(engine)
+instrument_engine(read_engine)
+
+# The async engines are only created when enabled, since they require the aiosqlite driver.
+async_engine = async_read_engine = None
+if ASYNC_DATABASE:
+    async_engine = create_async_engine(ASYNC_DATABASE_URL,
+                                       poolclass=AsyncAdaptedQueuePool,
+                                       pool_size=1,
+                                       max_overflow=0,
+                                       pool_timeout=DATABASE_POOL_TIMEOUT)
+    async_read_engine = create_async_engine(ASYNC_DATABASE_READ_URL,
+                                            poolclass=AsyncAdaptedQueuePool,
+                                            pool_size=DATABASE_READ_POOL_SIZE,
+                                            max_overflow=DATABASE_READ_MAX_OVERFLOW,
+                                            pool_timeout=DATABASE_POOL_TIMEOUT)
+    event.listen(async_engine.sync_engine, 'connect', set_sqlite_pragmas)
+    event.listen(async_read_engine.sync_engine, 'connect', set_read_pragmas)
+    instrument_engine(async_engine.sync_engine)
+    instrument_engine(async_read_engine.sync_engine)
+
+
+def create_db_and_tables(db_engine: Engine = engine):
+    SQLModel.metadata.create_all(db_engine)
+    with db_engine.begin() as connection:
+        create_search_tables(connection)
+        create_stats_triggers(connection)
 
 
 def get_session():
     with Session(engine) as session:
-        yield session
\ No newline at end of file
+        yield session
+
+
+def get_read_session():
+    with Session(read_engine) as session:
+        yield session
+
+
+async def get_async_session():
+    async with AsyncSession(async_engine, expire_on_commit=False) as session:
+        yield session
+
+
+async def get_async_read_session():
+    async with AsyncSession(async_read_engine, expire_on_commit=False) as session:
+        yield session
+
+
+# Session dependencies of the routers, selected by the ASYNC_DATABASE setting: get_db_session for the routes
+# that write, get_read_db_session for the GET routes.
+get_db_session = get_async_session if ASYNC_DATABASE else get_session
+get_read_db_session = get_async_read_session if ASYNC_DATABASE else get_read_session
+
+
+async def run_operation(db: Session | AsyncSession, operation: Callable, *args) -> Any:
+    """
+    Runs an operation of app.database.operations without blocking the event loop.
+    With an async session the operation runs on its sync facade, whose I/O is awaited on the aiosqlite
+    connection (no thread is used); with a sync session it runs in the threadpool, like a sync route.
+    @param db:          Session returned by get_db_session.
+    @param operation:   Operation receiving the sync session as first argument.
+    @param args:        Remaining arguments of the operation.
+    @return:            Result of the operation.
+    """
+    if isinstance(db, AsyncSession):
+        return await db.run_sync(operation, *args)
+    return await run_in_threadpool(operation, db, *args)
+
+
+# Writer of the group commit, its thread is started by the first write.
+group_writer = GroupCommitWriter(engine, GROUP_COMMIT_WINDOW, GROUP_COMMIT_MAX_BATCH)
+
+
+async def run_write(db: Session | AsyncSession, operation: Callable, *args) -> Any:
+    """
+    Runs a single row write operation. With GROUP_COMMIT it is queued to the group commit writer, which commits it
+    together with the writes of the concurrent requests; otherwise it runs like run_operation.
+    @param db:          Session returned by get_db_session, unused by the group commit.
+    @param operation:   Operation receiving the sync session as first argument, committing a single row.
+    @param args:        Remaining arguments of the operation.
+    @return:            Result of the operation, once committed.
+    """
+    if GROUP_COMMIT:
+        return await asyncio.wrap_future(group_writer.submit(operation, *args))
+    return await run_operation(db, operation, *args)
@@ -0,0 +1,114 @@
+"""
+In-process fan-out of the changes made by the write operations, streamed to the clients as Server-Sent Events.
+Event IDs are "<epoch>-<number>", where the epoch identifies the process: every worker of a multi-process server
+streams its own writes only, and IDs from another process (e.g. before a restart) cannot be resumed.
+"""
+
+# Python imports.
+import asyncio, orjson, uuid
+from collections import deque
+from dataclasses import dataclass, field
+from itertools import count
+from threading import Lock
+from typing import Any
+
+# Project imports.
+from settings import EVENTS_BUFFER_SIZE, EVENTS_QUEUE_SIZE
+
+
+@dataclass
+class Event:
+    id: int
+    entity: str
+    message: bytes
+
+
+@dataclass(eq=False)
+class Subscriber:
+    """
+    Connection receiving the events, with a bounded queue owned by its event loop.
+    """
+    loop: asyncio.AbstractEventLoop
+    queue: asyncio.Queue
+    entities: set[str] | None = None
+    dropped: bool = field(default=False)
+
+
+class EventBroker:
+    """
+    Publishes events to every subscriber and keeps the last ones to resume streams from a Last-Event-ID.
+    Events can be published from any thread (the operations run in the threadpool), while every subscriber
+    consumes them on its event loop. A subscriber whose queue is full is dropped instead of blocking the writes.
+    """
+
+    def __init__(self, buffer_size: int, queue_size: int):
+        self.queue_size = queue_size
+        self.epoch = uuid.uuid4().hex[:8]
+        self.buffer: deque[Event] = deque(maxlen=buffer_size)
+        self.subscribers: set[Subscriber] = set()
+        self._ids = count(1)
+        self._lock = Lock()
+
+    def publish(self, entity: str, action: str, data: Any) -> None:
+        """
+        Publishes an event to the subscribers of the entity.
+        @param entity:  Name of the entity changed, players or teams.
+        @param action:  Change made: created, updated or deleted.
+        @param data:    Data of the event, a model or a dictionary with at least the ID.
+        """
+        payload = data.model_dump(mode='json') if hasattr(data, 'model_dump') else data
+        with self._lock:
+            event_id = next(self._ids)
+            message = f'id: {self.epoch}-{event_id}\nevent: {entity}.{action}\ndata: '.encode() + orjson.dumps(payload) + b'\n\n'
+            event = Event(event_id, entity, message)
+            self.buffer.append(event)
+            subscribers = list(self.subscribers)
+        for subscriber in subscribers:
+            if subscriber.entities is None or entity in subscriber.entities:
+                try:
+                    subscriber.loop.call_soon_threadsafe(self._deliver, subscriber, event)
+                except RuntimeError:
+                    # The loop of the subscriber is closed.
+                    self.unsubscribe(subscriber)
+
+    def _deliver(self, subscriber: Subscriber, event: Event) -> None:
+        if subscriber.dropped:
+            return
+        try:
+            subscriber.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            subscriber.dropped = True
+            self.unsubscribe(subscriber)
+            # Discards every queued event and wakes up the stream so it closes: the Last-Event-ID of the client is
+            # then before all the events it did not receive, which are replayed when it reconnects.
+            while not subscriber.queue.empty():
+                subscriber.queue.get_nowait()
+            subscriber.queue.put_nowait(None)
+
+    def subscribe(self, last_event_id: str | None = None, entities: set[str] | None = None) -> tuple[Subscriber, list[Event] | None]:
+        """
+        Registers a subscriber on the running event loop.
+        @param last_event_id:   ID of the last event received by the client, to resume after it.
+        @param entities:        Entities whose events are received, or None for all.
+        @return:                Subscriber, and the events after last_event_id, or None when they cannot be resumed
+                                (too old or from another process): the client must resync, e.g. with the change feeds.
+        """
+        subscriber = Subscriber(asyncio.get_running_loop(), asyncio.Queue(self.queue_size), entities)
+        with self._lock:
+            self.subscribers.add(subscriber)
+            if last_event_id is None:
+                return subscriber, []
+
+            epoch, _, number = last_event_id.partition('-')
+            first, last = (self.buffer[0].id, self.buffer[-1].id) if self.buffer else (1, 0)
+            if epoch != self.epoch or not number.isdigit() or not first - 1 <= int(number) <= last:
+                return subscriber, None
+            return subscriber, [event for event in self.buffer if event.id > int(number)
+                                and (entities is None or event.entity in entities)]
+
+    def unsubscribe(self, subscriber: Subscriber) -> None:
+        with self._lock:
+            self.subscribers.discard(subscriber)
+
+
+events = EventBroker(EVENTS_BUFFER_SIZE, EVENTS_QUEUE_SIZE)
@@ -0,0 +1,151 @@
+"""
+Implements the group commit of the single row writes: a background writer runs the operations submitted by
+concurrent requests in batches, with one transaction (and one commit) per batch instead of one per request.
+"""
+
+# Python imports.
+import logging, time
+from concurrent.futures import Future
+from queue import Empty, SimpleQueue
+from threading import Lock, Thread
+from typing import Any, Callable
+from sqlalchemy import Engine
+from sqlmodel import Session
+
+
+logger = logging.getLogger(__name__)
+
+
+class GroupCommitSession(Session):
+    """
+    Session shared by the operations of a batch. commit() only flushes, so the operations keep their code and run
+    inside the transaction of the batch; the side effects registered with after_commit run once it is committed.
+    """
+
+    def __init__(self, bind: Engine):
+        super().__init__(bind, expire_on_commit=False)
+        self.info['after_commit'] = []
+
+    def commit(self) -> None:
+        self.flush()
+
+    def commit_batch(self) -> None:
+        super().commit()
+
+
+class GroupCommitWriter:
+    """
+    Background thread running the submitted operations in batches: it waits up to the window after the first
+    operation of a batch, or until the batch is full, and commits them together. Every operation runs in its own
+    savepoint, so a failed one is rolled back and its error is raised to its caller without affecting the others.
+    Callers get their result once the batch is committed.
+    """
+
+    def __init__(self, engine: Engine, window: float, max_batch: int):
+        """
+        @param engine:      Engine of the write connection.
+        @param window:      Seconds a batch waits for more operations after the first one.
+        @param max_batch:   Maximum number of operations per batch.
+        """
+        self.engine = engine
+        self.window = window
+        self.max_batch = max_batch
+        self.batches = 0
+        self._queue: SimpleQueue = SimpleQueue()
+        self._thread: Thread | None = None
+        self._lock = Lock()
+
+    def submit(self, operation: Callable, *args) -> Future:
+        """
+        Queues an operation, starting the writer thread when it is not running.
+        @param operation:   Operation of app.database.operations receiving the session as first argument.
+        @param args:        Remaining arguments of the operation.
+        @return:            Future of the result of the operation.
+        """
+        future = Future()
+        with self._lock:
+            if self._thread is None:
+                self._thread = Thread(target=self._run, name='group-commit-writer', daemon=True)
+                self._thread.start()
+            self._queue.put((operation, args, future))
+        return future
+
+    def stop(self) -> None:
+        """
+        Stops the writer thread once the queued operations are written.
+        """
+        with self._lock:
+            if self._thread is not None:
+                self._queue.put(None)
+                self._thread.join()
+                self._thread = None
+
+    def _next_batch(self) -> list[tuple[Callable, tuple, Future]] | None:
+        """
+        Waits for the operations of the next batch.
+        @return:    Queued operations, or None when the writer is stopped.
+        """
+        if (first := self._queue.get()) is None:
+            return None
+        batch, deadline = [first], time.monotonic() + self.window
+        while len(batch) < self.max_batch:
+            try:
+                item = self._queue.get(timeout=max(0, deadline - time.monotonic()))
+            except Empty:
+                break
+            if item is None:
+                # Stops after writing this batch.
+                self._queue.put(None)
+                break
+            batch.append(item)
+        return batch
+
+    def _run(self) -> None:
+        while (batch := self._next_batch()) is not None:
+            try:
+                self.write_batch(batch)
+            except Exception as error:
+                # The writer keeps running, otherwise every later write would wait forever.
+                logger.exception('Group commit batch failed')
+                for _, _, future in batch:
+                    if not future.done():
+                        future.set_exception(error)
+
+    def write_batch(self, batch: list[tuple[Callable, tuple, Future]]) -> None:
+        """
+        Runs the operations of a batch in one transaction, and resolves their futures once it is committed.
+        @param batch:   Operations with their arguments and futures.
+        """
+        batch = [item for item in batch if item[2].set_running_or_notify_cancel()]
+        results = []
+        try:
+            with GroupCommitSession(self.engine) as session:
+                # Takes the write lock up front: the savepoints must be nested in this transaction, or releasing the
+                # first one would commit it.
+                session.connection().exec_driver_sql('BEGIN IMMEDIATE')
+                for operation, args, future in batch:
+                    pending = len(session.info['after_commit'])
+                    try:
+                        with session.begin_nested():
+                            result = operation(session, *args)
+                    except Exception as error:
+                        del session.info['after_commit'][pending:]
+                        future.set_exception(error)
+                    else:
+                        results.append((future, result))
+                session.commit_batch()
+        except Exception as error:
+            for _, _, future in batch:
+                if not future.done():
+                    future.set_exception(error)
+            return
+
+        self.batches += 1
+        for callback in session.info['after_commit']:
+            # The writes are committed: a failed side effect is logged without failing them.
+            try:
+                callback()
+            except Exception:
+                logger.exception('Group commit callback failed')
+        for future, result in results:
+            future.set_result(result)
@@ -0,0 +1,128 @@
+"""
+Measures the queries run by every request through the engine cursor events, and logs the slow ones with their
+query plan when profiling is enabled.
+"""
+
+# Python imports.
+import logging, time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Iterator
+from sqlalchemy import Engine, event
+
+# Project imports.
+from settings import QUERY_PROFILING, SLOW_QUERY_THRESHOLD
+
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class QueryStats:
+    """
+    Queries run while handling a request. The same object is shared by the threads and greenlets that run the
+    database operations of the request, since they copy the context of the request task.
+    Statements are only kept when a list is given, for the query assertions of the tests.
+    """
+    count: int = 0
+    time: float = 0.0
+    statements: list[str] | None = field(default=None, repr=False)
+
+    def add(self, statement: str, elapsed: float) -> None:
+        self.count += 1
+        self.time += elapsed
+        if self.statements is not None:
+            self.statements.append(statement)
+
+
+query_stats: ContextVar[QueryStats | None] = ContextVar('query_stats', default=None)
+
+# Stats counting every query of the process, whatever the thread or request (see count_queries).
+collectors: list[QueryStats] = []
+
+# Transaction control statements, which are not counted by count_queries.
+TRANSACTION_STATEMENTS = ('BEGIN', 'COMMIT', 'ROLLBACK', 'SAVEPOINT', 'RELEASE')
+
+
+@contextmanager
+def tracking_queries() -> Iterator[QueryStats]:
+    """
+    Tracks the queries of the current request, sharing the stats already tracked by an outer middleware.
+    @return:    Stats of the request.
+    """
+    if stats := query_stats.get():
+        yield stats
+        return
+    stats = QueryStats()
+    token = query_stats.set(stats)
+    try:
+        yield stats
+    finally:
+        query_stats.reset(token)
+
+
+@contextmanager
+def count_queries() -> Iterator[QueryStats]:
+    """
+    Counts every query run in the process while the block runs, including the ones of the test client thread and of
+    the group commit writer. Transaction control statements (e.g. the BEGIN and savepoints of the group commit) are
+    not counted, so the query budgets are the same in every mode.
+    @return:    Stats with the statements run.
+    """
+    stats = QueryStats(statements=[])
+    collectors.append(stats)
+    try:
+        yield stats
+    finally:
+        collectors.remove(stats)
+
+
+@contextmanager
+def max_queries(limit: int) -> Iterator[QueryStats]:
+    """
+    Asserts the block runs at most a number of queries, listing the statements when it runs more.
+    @param limit:   Maximum number of queries.
+    @return:        Stats with the statements run.
+    """
+    with count_queries() as stats:
+        yield stats
+    assert stats.count <= limit, f'{stats.count} queries run, expected at most {limit}:\n' + '\n'.join(stats.statements)
+
+
+def log_slow_query(dbapi_connection, statement: str, parameters, elapsed: float) -> None:
+    """
+    Logs a slow statement with its query plan, run on the same connection.
+    """
+    try:
+        explain = dbapi_connection.cursor()
+        explain.execute(f'EXPLAIN QUERY PLAN {statement}', parameters)
+        plan = '\n'.join(f'  {row[-1]}' for row in explain.fetchall())
+        explain.close()
+    except Exception as error:
+        plan = f'  (no plan: {error})'
+    logger.warning('Slow query (%.1f ms): %s\n%s', elapsed * 1000, statement, plan)
+
+
+def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('query_start_time', []).append(time.perf_counter())
+
+
+def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info['query_start_time'].pop()
+    if stats := query_stats.get():
+        stats.add(statement, elapsed)
+    if not statement.lstrip().upper().startswith(TRANSACTION_STATEMENTS):
+        for stats in collectors:
+            stats.add(statement, elapsed)
+    if QUERY_PROFILING and elapsed >= SLOW_QUERY_THRESHOLD and not executemany:
+        log_slow_query(conn.connection, statement, parameters, elapsed)
+
+
+def instrument_engine(db_engine: Engine) -> None:
+    """
+    Adds the query timing listeners to an engine.
+    @param db_engine:   Synchronous engine (the sync_engine of an async one).
+    """
+    event.listen(db_engine, 'before_cursor_execute', before_cursor_execute)
+    event.listen(db_engine, 'after_cursor_execute', after_cursor_execute)
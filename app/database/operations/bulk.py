@@ -0,0 +1,65 @@
+"""
+Implements the batched insert and lookup shared by the bulk operations on the database.
+"""
+
+# Python imports.
+from sqlalchemy import insert
+from sqlalchemy.exc import SQLAlchemyError
+from sqlmodel import Session, SQLModel
+from sqlmodel.sql.expression import Select
+
+
+def insert_in_chunks(db: Session, model: type[SQLModel], rows: list[dict], chunk_size: int) -> tuple[dict, dict]:
+    """
+    Inserts rows with one executemany statement and one transaction per chunk.
+    A failed chunk is rolled back without affecting the chunks already committed, and its rows are inserted again
+    one by one, so only the rows that fail are reported.
+    @param db:          Database session.
+    @param model:       Database model of the table.
+    @param rows:        Column values of every row to insert.
+    @param chunk_size:  Maximum number of rows per transaction.
+    @return:            IDs by position of the inserted rows and error messages by position of the failed rows.
+    """
+    ids, errors = {}, {}
+    statement = insert(model).returning(model.id, sort_by_parameter_order=True)
+
+    for start in range(0, len(rows), chunk_size):
+        chunk = rows[start:start + chunk_size]
+        try:
+            chunk_ids = db.scalars(statement, chunk).all()
+            db.commit()
+        except SQLAlchemyError:
+            db.rollback()
+            for position, row in enumerate(chunk, start=start):
+                try:
+                    ids[position] = db.scalars(statement, [row]).one()
+                    db.commit()
+                except SQLAlchemyError as error:
+                    db.rollback()
+                    errors[position] = str(getattr(error, 'orig', None) or error)
+        else:
+            ids.update(zip(range(start, start + len(chunk)), chunk_ids))
+
+    return ids, errors
+
+
+def select_by_ids(db: Session, query: Select, model: type[SQLModel], ids: list[int], chunk_size: int,
+                  columns: bool = False) -> list:
+    """
+    Runs a select restricted to a list of IDs, with one IN query per chunk to stay under the SQLite parameters limit.
+    @param db:          Database session.
+    @param query:       Select statement of database objects, or of columns including the id.
+    @param model:       Database model of the table.
+    @param ids:         Identifiers to look up, without duplicates.
+    @param chunk_size:  Maximum number of IDs per query.
+    @param columns:     Whether the query selects columns, returned as mappings, instead of database objects.
+    @return:            Rows found, in the order of the given IDs.
+    """
+    found = {}
+    for start in range(0, len(ids), chunk_size):
+        result = db.execute(query.where(model.id.in_(ids[start:start + chunk_size])))
+        if columns:
+            found.update((row['id'], row) for row in result.mappings())
+        else:
+            found.update((row.id, row) for row in result.scalars())
+    return [found[id] for id in ids if id in found]
@@ -0,0 +1,27 @@
+"""
+Implements the change feed shared by the operations on the database.
+"""
+
+# Python imports.
+from pydantic import BaseModel
+from sqlalchemy import tuple_
+from sqlmodel import Session, SQLModel, select
+
+
+def select_changes(db: Session, table: type[SQLModel], model: type[BaseModel], limit: int,
+                   after: tuple[int, int] | None = None) -> list[BaseModel]:
+    """
+    Gets the rows created, updated or deleted (inactivated) after a position of the change feed, with an index seek
+    on the change sequence.
+    @param db:      Database session.
+    @param table:   Database model of the table.
+    @param model:   Model of the returned rows, its fields are the selected columns.
+    @param limit:   Maximum number of rows to return.
+    @param after:   Change sequence and ID of the last row already seen, or None to start from the beginning.
+    @return:        Rows ordered by change sequence and ID.
+    """
+    query = select(*[getattr(table, field) for field in model.model_fields])
+    if after:
+        query = query.where(tuple_(table.change_seq, table.id) > tuple_(*after))
+    query = query.order_by(table.change_seq, table.id).limit(limit)
+    return [model(**row) for row in db.exec(query).mappings()]
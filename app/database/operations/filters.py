@@ -0,0 +1,70 @@
+"""
+Implements the filters and the sorted keyset pagination shared by the list operations on the database.
+"""
+
+# Python imports.
+from typing import Any
+from sqlalchemy import tuple_
+from sqlmodel import SQLModel
+from sqlmodel.sql.expression import Select
+
+# Project imports.
+from ..search import SEARCH_COLUMNS, contains
+
+
+def matches(model: type[SQLModel], field: str, value: Any):
+    """
+    Builds the condition of a filter: <column>_min and <column>_max are inclusive bounds of the column, the text
+    columns are searched by substring and the other columns must be equal to the value.
+    @param model:   Database model of the table.
+    @param field:   Name of the filter.
+    @param value:   Value of the filter.
+    @return:        SQL condition.
+    """
+    if field.endswith('_min'):
+        return getattr(model, field.removesuffix('_min')) >= value
+    if field.endswith('_max'):
+        return getattr(model, field.removesuffix('_max')) <= value
+    if field in SEARCH_COLUMNS[model.__tablename__]:
+        return contains(model, field, value)
+    return getattr(model, field) == value
+
+
+def filter_rows(query: Select, model: type[SQLModel], filters: dict) -> Select:
+    """
+    Restricts a query to the rows matching the filters, ignoring the empty ones. Only the active rows are returned
+    unless the is_active filter is given.
+    @param query:   Select statement over the table.
+    @param model:   Database model of the table.
+    @param filters: Dictionary with the filters by name.
+    @return:        Filtered select statement.
+    """
+    # Compared with a constant, is_active is rendered as a literal and the partial indexes on the active rows apply.
+    query = query.where(model.is_active == (filters.get('is_active') is not False))
+
+    for field, value in filters.items():
+        if field != 'is_active' and value is not None and value != '':
+            query = query.where(matches(model, field, value))
+
+    return query
+
+
+def sort_rows(query: Select, model: type[SQLModel], sort: str = 'id', after_id: int = None, after_value: Any = None) -> Select:
+    """
+    Orders a query by a column and the ID, starting after the last row of the previous page (keyset pagination).
+    @param query:       Select statement over the table.
+    @param model:       Database model of the table.
+    @param sort:        Column to sort by, with a leading - for the descending order.
+    @param after_id:    ID of the last row of the previous page, or None for the first page.
+    @param after_value: Value of the sort column in the last row of the previous page.
+    @return:            Sorted select statement.
+    """
+    descending = sort.startswith('-')
+    key = sort.removeprefix('-')
+    columns = (model.id,) if key == 'id' else (getattr(model, key), model.id)
+
+    if after_id is not None:
+        position, after = (model.id, after_id) if key == 'id' else (tuple_(*columns), tuple_(after_value, after_id))
+        query = query.where(position < after if descending else position > after)
+
+    return query.order_by(*(column.desc() for column in columns) if descending else columns)
@@ -3,10 +3,22 @@ Implements the players operations on the database.
 """
 
 # Python imports.
+from functools import partial
+from typing import Any, Iterator
+from sqlalchemy import RowMapping, insert, update
 from sqlmodel import Session, select
+from sqlmodel.sql.expression import Select
 
 # Project imports.
-from ...models import PlayerBase, Player, PlayerDB, PlayerUpdates
+from settings import BULK_CHUNK_SIZE, EXPORT_BATCH_SIZE, IDS_CHUNK_SIZE
+from .bulk import insert_in_chunks, select_by_ids
+from .changes import select_changes
+from .filters import filter_rows, sort_rows
+from .writes import after_commit, write_returning
+from ..cache import players_cache
+from ..events import events
+from ..versions import changing
+from ...models import PlayerBase, Player, PlayerChange, PlayerDB, PlayerUpdates, PlayerBulkUpdates, TeamDB
 
 
 def create_player(db: Session, player: PlayerBase) -> Player:
@@ -16,68 +28,196 @@ def create_player(db: Session, player: PlayerBase) -> Player:
     @param player:  PlayerBase object to be added into the database.
     @return:        Player object created into the database.
     """
-    db_player = PlayerDB(**player.model_dump())
-    db.add(db_player)
-    db.commit()
-    db.refresh(db_player)
-    return db_player
+    if created := write_returning(db, insert(PlayerDB).values(**player.model_dump(), is_active=True), PlayerDB, Player):
+        after_commit(db, partial(events.publish, 'players', 'created', created))
+    return created
+
+
+def create_players(db: Session, players: list[PlayerBase], chunk_size: int = BULK_CHUNK_SIZE) -> tuple[dict, dict]:
+    """
+    Creates many players in the database using batched inserts.
+    @param db:          Database session.
+    @param players:     List of PlayerBase objects to be added into the database.
+    @param chunk_size:  Maximum number of players inserted per transaction.
+    @return:            IDs by position of the created players and errors by position of the failed ones.
+    """
+    rows = [{**player.model_dump(), 'is_active': True} for player in players]
+    with changing('players'):
+        ids, errors = insert_in_chunks(db, PlayerDB, rows, chunk_size)
+    for position, player_id in ids.items():
+        events.publish('players', 'created', {**players[position].model_dump(mode='json'), 'id': player_id})
+    return ids, errors
+
+
+def get_player_db(db: Session, player_id: int) -> PlayerDB:
+    """
+    Gets the database object of an active player by ID, without going through the cache.
+    @param db:          Database session.
+    @param player_id:   Identifier of the player.
+    @return:            Player database object by the given id.
+    """
+    return db.exec(select(PlayerDB).where(PlayerDB.id == player_id).where(PlayerDB.is_active == True)).first()
 
 
 def get_player_by_id(db: Session, player_id: int) -> Player:
     """
-    Gets a player by ID.
+    Gets a player by ID, answering repeated lookups from the players cache.
     @param db:          Database session.
     @param player_id:   Identifier of the player.
     @return:            Player by the given id.
     """
-    return db.exec(select(PlayerDB).where(PlayerDB.id == player_id).where(PlayerDB.is_active == True)).first()
+    def load() -> Player | None:
+        if db_player := get_player_db(db, player_id):
+            return Player.model_validate(db_player)
 
+    return players_cache.get_or_load(player_id, load)
 
-def get_players(db: Session, filters: dict) -> list[Player]:
+
+def filter_players(query: Select, filters: dict) -> Select:
     """
-    Gets a list with all players availables and filtered by one or more parameters.
-    @param db:      Database session.
+    Restricts a query to the active players matching the filters: substring search on the text columns, inclusive
+    ranges with the <column>_min and <column>_max keys (e.g. height_min) and exact values on the other columns
+    (e.g. team_id). Inactive players are returned instead when is_active is False.
+    @param query:   Select statement over the players table.
     @param filters: Dictionary with filters to search players.
-    @return:        List of players.
+    @return:        Filtered select statement.
+    """
+    return filter_rows(query, PlayerDB, filters)
+
+
+def get_players(db: Session, filters: dict, limit: int = None, after_id: int = None, fields: list[str] = None,
+                sort: str = 'id', after_value: Any = None) -> list[Player]:
+    """
+    Gets a list with all players availables and filtered by one or more parameters.
+    @param db:          Database session.
+    @param filters:     Dictionary with filters to search players.
+    @param limit:       Maximum number of players to return.
+    @param after_id:    ID of the last player of the previous page (keyset pagination).
+    @param fields:      Columns to select, returning mappings instead of database objects (which are slower to build).
+    @param sort:        Column to sort by (id, birthdate, height or dorsal), with a leading - for the descending order.
+    @param after_value: Value of the sort column in the last player of the previous page.
+    @return:            List of players ordered by the sort column and ID.
     """    
-    query = select(PlayerDB).where(PlayerDB.is_active == True)
+    query = filter_players(select(*[getattr(PlayerDB, field) for field in fields]) if fields else select(PlayerDB), filters)
+    query = sort_rows(query, PlayerDB, sort, after_id, after_value)
+    if limit:
+        query = query.limit(limit)
+
+    # Projections are read as mappings: sqlmodel would return plain values for a single column (e.g. only the id).
+    return db.execute(query).mappings().all() if fields else db.exec(query).all()
+
+
+def get_players_by_ids(db: Session, player_ids: list[int], fields: list[str] = None, chunk_size: int = IDS_CHUNK_SIZE) -> list[Player]:
+    """
+    Gets the active players of a list of IDs in one query per chunk of IDs.
+    @param db:          Database session.
+    @param player_ids:  Identifiers of the players, without duplicates.
+    @param fields:      Columns to select, returning mappings instead of players.
+    @param chunk_size:  Maximum number of IDs per query.
+    @return:            Players found, in the order of the given IDs.
+    """
+    query = filter_players(select(*[getattr(PlayerDB, field) for field in fields]) if fields else select(PlayerDB), {})
+    players = select_by_ids(db, query, PlayerDB, player_ids, chunk_size, columns=bool(fields))
+    return players if fields else [Player.model_validate(player) for player in players]
 
-    for field, value in filters.items():
-        if value:
-            query = query.where(getattr(PlayerDB, field).contains(value))
 
-    return db.exec(query).all()
+def get_player_changes(db: Session, limit: int, after: tuple[int, int] = None) -> list[PlayerChange]:
+    """
+    Gets the players created, updated or deleted (inactivated) since a position of the change feed.
+    @param db:      Database session.
+    @param limit:   Maximum number of players to return.
+    @param after:   Change sequence and ID of the last player already seen, or None to start from the beginning.
+    @return:        List of players ordered by change sequence and ID.
+    """
+    return select_changes(db, PlayerDB, PlayerChange, limit, after)
+
+
+def iter_players(db: Session, filters: dict, batch_size: int = EXPORT_BATCH_SIZE) -> Iterator[RowMapping]:
+    """
+    Iterates over all players availables and filtered by one or more parameters, without loading them all in memory.
+    Only the columns of the Player model are selected and rows are fetched from the cursor in batches.
+    @param db:          Database session.
+    @param filters:     Dictionary with filters to search players.
+    @param batch_size:  Number of rows fetched from the cursor at once.
+    @return:            Iterator of players rows ordered by ID.
+    """
+    columns = [getattr(PlayerDB, field) for field in Player.model_fields]
+    query = filter_players(select(*columns), filters).order_by(PlayerDB.id)
+    yield from db.exec(query.execution_options(yield_per=batch_size)).mappings()
 
 
 def update_player(db: Session, player_id: int, player_updates: PlayerUpdates) -> Player:
     """
-    Gets a list with all teams availables or filtered by one parameter.
+    Updates an active player by ID with one UPDATE ... RETURNING statement.
     @param db:              Database session.
     @param player_id:       Identifier of the player.
     @param player_updates:  Object with fields and data to update.
-    @return:                Updated player by the given id.
+    @return:                Updated player by the given id, or None if it does not exist.
     """
-    if player := get_player_by_id(db, player_id):
-        update_data = player_updates.model_dump(exclude_unset=True)
+    update_data = player_updates.model_dump(exclude_unset=True)
+    if not update_data:
+        return get_player_by_id(db, player_id)
+
+    statement = update(PlayerDB).where(PlayerDB.id == player_id, PlayerDB.is_active == True).values(**update_data)
+    if player := write_returning(db, statement, PlayerDB, Player):
+        after_commit(db, partial(players_cache.invalidate, player_id), partial(events.publish, 'players', 'updated', player))
+    return player
+
 
-        for key, value in update_data.items():
-            setattr(player, key, value)
-        
+def update_players(db: Session, players_updates: list[PlayerBulkUpdates], chunk_size: int = IDS_CHUNK_SIZE) -> tuple[list, list, list]:
+    """
+    Updates many active players in one transaction, with one UPDATE statement per distinct set of changes
+    (e.g. all the players transferred to the same team) and chunk of IDs.
+    The target teams are checked with one query; if any does not exist, nothing is updated.
+    Updates of the same player are merged in order and updates without fields are ignored.
+    @param db:              Database session.
+    @param players_updates: Objects with the ID of the player and the fields and data to update.
+    @param chunk_size:      Maximum number of IDs per statement.
+    @return:                IDs of the updated players, IDs not found and IDs of the target teams not found.
+    """
+    changes = {}
+    for player_updates in players_updates:
+        changes.setdefault(player_updates.id, {}).update(player_updates.model_dump(exclude_unset=True, exclude={'id'}))
+
+    team_ids = {data['team_id'] for data in changes.values() if data.get('team_id') is not None}
+    if team_ids:
+        found = set(db.exec(select(TeamDB.id).where(TeamDB.id.in_(team_ids), TeamDB.is_active == True)).all())
+        if invalid := sorted(team_ids - found):
+            return [], [], invalid
+
+    groups = {}
+    for player_id, data in changes.items():
+        if data:
+            groups.setdefault(tuple(sorted(data.items())), []).append(player_id)
+
+    # The full rows are returned to publish the same events as update_player.
+    columns = [getattr(PlayerDB, field) for field in Player.model_fields]
+    updated = {}
+    with changing('players'):
+        for data, player_ids in groups.items():
+            for start in range(0, len(player_ids), chunk_size):
+                statement = update(PlayerDB).where(PlayerDB.id.in_(player_ids[start:start + chunk_size]), PlayerDB.is_active == True)
+                rows = db.exec(statement.values(**dict(data)).returning(*columns)
+                               .execution_options(synchronize_session=False)).mappings()
+                updated.update((row['id'], Player(**row)) for row in rows)
         db.commit()
-        db.refresh(player)
-        
-        return player
-    
+
+    requested = [player_id for player_id, data in changes.items() if data]
+    for player_id in requested:
+        if player_id in updated:
+            players_cache.invalidate(player_id)
+            events.publish('players', 'updated', updated[player_id])
+    return [id for id in requested if id in updated], [id for id in requested if id not in updated], []
+
 
 def delete_player(db: Session, player_id: int) -> Player:
     """
-    Deletes (inactivates) a player by ID.
-    @param db:      Database session.
-    @param player_id: Identifier of the player.
+    Deletes (inactivates) a player by ID with one UPDATE ... RETURNING statement.
+    @param db:          Database session.
+    @param player_id:   Identifier of the player.
+    @return:            Deleted player, or None if it does not exist.
     """
-    if player := get_player_by_id(db, player_id):
-        player.is_active = False
-        db.commit()
-        db.refresh(player)
-        return player
-    
\ No newline at end of file
+    statement = update(PlayerDB).where(PlayerDB.id == player_id, PlayerDB.is_active == True).values(is_active=False)
+    if player := write_returning(db, statement, PlayerDB, Player):
+        after_commit(db, partial(players_cache.invalidate, player_id), partial(events.publish, 'players', 'deleted', player))
+    return player
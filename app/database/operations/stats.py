@@ -0,0 +1,78 @@
+"""
+Implements the squad statistics operations on the database.
+"""
+
+# Python imports.
+from datetime import date
+from sqlalchemy import text
+from sqlmodel import Session, select, func
+
+# Project imports.
+from .teams import get_team_by_id
+from ..stats import REBUILD_STATS
+from ..versions import changing
+from ...models import SquadStats, TeamStats, TeamStatsDB, TeamStatsFacetDB
+
+
+def build_stats(player_count: int, height_sum: float, facets: list[tuple[str, str, int]]) -> dict:
+    """
+    Builds the statistics from the rows of the summary tables.
+    @param player_count:    Number of active players.
+    @param height_sum:      Sum of the heights of the players.
+    @param facets:          List of (facet, value, count) rows.
+    @return:                Dictionary with the fields of SquadStats.
+    """
+    distributions = {facet: {} for facet in ('position', 'nationality', 'dorsal', 'birth_year')}
+    for facet, value, count in facets:
+        distributions[facet][value] = count
+
+    # Age reached by the players this year.
+    this_year = date.today().year
+    ages = {}
+    for year, count in distributions['birth_year'].items():
+        ages[this_year - int(year)] = ages.get(this_year - int(year), 0) + count
+
+    return {'player_count': player_count,
+            'average_height': round(height_sum / player_count, 3) if player_count else None,
+            'ages': dict(sorted(ages.items())),
+            'positions': distributions['position'],
+            'nationalities': distributions['nationality'],
+            'dorsals': dict(sorted((int(dorsal), count) for dorsal, count in distributions['dorsal'].items()))}
+
+
+def get_team_stats(db: Session, team_id: int) -> TeamStats:
+    """
+    Gets the statistics of the active players of a team from the summary tables.
+    @param db:      Database session.
+    @param team_id: Identifier of the team.
+    @return:        Statistics of the team, or None if the team does not exist.
+    """
+    if get_team_by_id(db, team_id):
+        totals = db.get(TeamStatsDB, team_id) or TeamStatsDB(team_id=team_id)
+        query = select(TeamStatsFacetDB.facet, TeamStatsFacetDB.value, TeamStatsFacetDB.count)
+        facets = db.exec(query.where(TeamStatsFacetDB.team_id == team_id)).all()
+        return TeamStats(team_id=team_id, **build_stats(totals.player_count, totals.height_sum, facets))
+
+
+def get_league_stats(db: Session) -> SquadStats:
+    """
+    Gets the statistics of all active players, adding up the summary tables of the teams.
+    @param db:  Database session.
+    @return:    Statistics of the league.
+    """
+    player_count, height_sum = db.exec(select(func.coalesce(func.sum(TeamStatsDB.player_count), 0),
+                                              func.coalesce(func.sum(TeamStatsDB.height_sum), 0))).one()
+    query = select(TeamStatsFacetDB.facet, TeamStatsFacetDB.value, func.sum(TeamStatsFacetDB.count))
+    facets = db.exec(query.group_by(TeamStatsFacetDB.facet, TeamStatsFacetDB.value)).all()
+    return SquadStats(**build_stats(player_count, height_sum, facets))
+
+
+def rebuild_stats(db: Session) -> None:
+    """
+    Recomputes the summary tables from the players table.
+    @param db:  Database session.
+    """
+    for statement in REBUILD_STATS:
+        db.exec(text(statement))
+    with changing('players'):
+        db.commit()
@@ -3,10 +3,23 @@ Implements the teams operations on the database.
 """
 
 # Python imports.
+from functools import partial
+from typing import Any, Iterator
+from sqlalchemy import RowMapping, insert, update
+from sqlalchemy.orm import selectinload
 from sqlmodel import Session, select
+from sqlmodel.sql.expression import Select
 
 # Project imports.
-from ...models import TeamBase, Team, TeamDB, TeamUpdates
+from settings import BULK_CHUNK_SIZE, EXPORT_BATCH_SIZE, IDS_CHUNK_SIZE
+from .bulk import insert_in_chunks, select_by_ids
+from .changes import select_changes
+from .filters import filter_rows, sort_rows
+from .writes import after_commit, write_returning
+from ..cache import teams_cache
+from ..events import events
+from ..versions import changing
+from ...models import TeamBase, Team, TeamChange, TeamDB, TeamUpdates, TeamWithPlayers, Player, PlayerDB
 
 
 def create_team(db: Session, team: TeamBase) -> Team:
@@ -16,68 +29,194 @@ def create_team(db: Session, team: TeamBase) -> Team:
     @param team:    TeamBase object to be added into the database.
     @return:        Team object created into the database.
     """
-    db_team = TeamDB(**team.model_dump())
-    db.add(db_team)
-    db.commit()
-    db.refresh(db_team)
-    return db_team
+    if created := write_returning(db, insert(TeamDB).values(**team.model_dump(), is_active=True), TeamDB, Team):
+        after_commit(db, partial(events.publish, 'teams', 'created', created))
+    return created
 
 
-def get_team_by_id(db: Session, team_id: int) -> Team:
+def create_teams(db: Session, teams: list[TeamBase], chunk_size: int = BULK_CHUNK_SIZE) -> tuple[dict, dict]:
     """
-    Gets a team by ID.
-    @param db:      Database session.
-    @param team_id: Identifier of the team.
-    @return:        Team by the given id.
+    Creates many teams in the database using batched inserts.
+    @param db:          Database session.
+    @param teams:       List of TeamBase objects to be added into the database.
+    @param chunk_size:  Maximum number of teams inserted per transaction.
+    @return:            IDs by position of the created teams and errors by position of the failed ones.
+    """
+    rows = [{**team.model_dump(), 'is_active': True} for team in teams]
+    with changing('teams'):
+        ids, errors = insert_in_chunks(db, TeamDB, rows, chunk_size)
+    for position, team_id in ids.items():
+        events.publish('teams', 'created', {**teams[position].model_dump(mode='json'), 'id': team_id})
+    return ids, errors
+
+
+# Loads the active players of the teams with one extra query for all of them.
+active_players = selectinload(TeamDB.players.and_(PlayerDB.is_active == True))
+
+
+def get_team_db(db: Session, team_id: int) -> TeamDB:
+    """
+    Gets the database object of an active team by ID, without going through the cache.
+    @param db:          Database session.
+    @param team_id:     Identifier of the team.
+    @return:            Team database object by the given id.
     """
     return db.exec(select(TeamDB).where(TeamDB.id == team_id).where(TeamDB.is_active == True)).first()
 
 
-def get_teams(db: Session, filters: dict) -> list[Team]:
+def get_team_by_id(db: Session, team_id: int) -> Team:
     """
-    Gets a list with all teams availables and filtered by one or more parameters.
-    @param db:      Database session.
+    Gets a team by ID, answering repeated lookups from the teams cache.
+    @param db:          Database session.
+    @param team_id:     Identifier of the team.
+    @return:            Team by the given id.
+    """
+    def load() -> Team | None:
+        if db_team := get_team_db(db, team_id):
+            return Team.model_validate(db_team)
+
+    return teams_cache.get_or_load(team_id, load)
+
+
+def get_team_with_players(db: Session, team_id: int) -> TeamWithPlayers:
+    """
+    Gets a team by ID with its active players.
+    @param db:          Database session.
+    @param team_id:     Identifier of the team.
+    @return:            Team with players by the given id.
+    """
+    query = select(TeamDB).where(TeamDB.id == team_id).where(TeamDB.is_active == True).options(active_players)
+    if team := db.exec(query).first():
+        return TeamWithPlayers.model_validate(team)
+
+
+def filter_teams(query: Select, filters: dict) -> Select:
+    """
+    Restricts a query to the active teams matching the filters, searched by substring.
+    Inactive teams are returned instead when is_active is False.
+    @param query:   Select statement over the teams table.
     @param filters: Dictionary with filters to search teams.
-    @return:        List of teams.
+    @return:        Filtered select statement.
+    """
+    return filter_rows(query, TeamDB, filters)
+
+
+def get_teams(db: Session, filters: dict, limit: int = None, after_id: int = None, include_players: bool = False,
+              fields: list[str] = None, sort: str = 'id', after_value: Any = None) -> list[Team] | list[TeamWithPlayers]:
+    """
+    Gets a list with all teams availables and filtered by one or more parameters.
+    @param db:              Database session.
+    @param filters:         Dictionary with filters to search teams.
+    @param limit:           Maximum number of teams to return.
+    @param after_id:        ID of the last team of the previous page (keyset pagination).
+    @param include_players: Whether the active players of every team are loaded too (one extra query).
+    @param fields:          Columns to select, returning mappings instead of database objects (ignored with include_players).
+    @param sort:            Column to sort by (id or name), with a leading - for the descending order.
+    @param after_value:     Value of the sort column in the last team of the previous page.
+    @return:                List of teams ordered by the sort column and ID.
     """    
-    query = select(TeamDB).where(TeamDB.is_active == True)
+    if fields and not include_players:
+        query = filter_teams(select(*[getattr(TeamDB, field) for field in fields]), filters)
+    else:
+        query = filter_teams(select(TeamDB), filters)
+
+    query = sort_rows(query, TeamDB, sort, after_id, after_value)
+    if limit:
+        query = query.limit(limit)
+
+    if include_players:
+        return [TeamWithPlayers.model_validate(team) for team in db.exec(query.options(active_players))]
+    if fields:
+        # Read as mappings: sqlmodel would return plain values for a single column (e.g. only the id).
+        return db.execute(query).mappings().all()
+    return [Team.model_validate(team) for team in db.exec(query)]
+
+
+def get_teams_by_ids(db: Session, team_ids: list[int], include_players: bool = False, fields: list[str] = None,
+                     chunk_size: int = IDS_CHUNK_SIZE) -> list[Team] | list[TeamWithPlayers]:
+    """
+    Gets the active teams of a list of IDs in one query per chunk of IDs.
+    @param db:              Database session.
+    @param team_ids:        Identifiers of the teams, without duplicates.
+    @param include_players: Whether the active players of every team are loaded too (one extra query per chunk).
+    @param fields:          Columns to select, returning mappings instead of teams (ignored with include_players).
+    @param chunk_size:      Maximum number of IDs per query.
+    @return:                Teams found, in the order of the given IDs.
+    """
+    if fields and not include_players:
+        query = filter_teams(select(*[getattr(TeamDB, field) for field in fields]), {})
+    else:
+        query = filter_teams(select(TeamDB), {})
+
+    if include_players:
+        teams = select_by_ids(db, query.options(active_players), TeamDB, team_ids, chunk_size)
+        return [TeamWithPlayers.model_validate(team) for team in teams]
+    teams = select_by_ids(db, query, TeamDB, team_ids, chunk_size, columns=bool(fields))
+    return teams if fields else [Team.model_validate(team) for team in teams]
+
+
+def get_team_changes(db: Session, limit: int, after: tuple[int, int] = None) -> list[TeamChange]:
+    """
+    Gets the teams created, updated or deleted (inactivated) since a position of the change feed.
+    @param db:      Database session.
+    @param limit:   Maximum number of teams to return.
+    @param after:   Change sequence and ID of the last team already seen, or None to start from the beginning.
+    @return:        List of teams ordered by change sequence and ID.
+    """
+    return select_changes(db, TeamDB, TeamChange, limit, after)
+
+
+def iter_teams(db: Session, filters: dict, batch_size: int = EXPORT_BATCH_SIZE) -> Iterator[RowMapping]:
+    """
+    Iterates over all teams availables and filtered by one or more parameters, without loading them all in memory.
+    Only the columns of the Team model are selected and rows are fetched from the cursor in batches.
+    @param db:          Database session.
+    @param filters:     Dictionary with filters to search teams.
+    @param batch_size:  Number of rows fetched from the cursor at once.
+    @return:            Iterator of teams rows ordered by ID.
+    """
+    columns = [getattr(TeamDB, field) for field in Team.model_fields]
+    query = filter_teams(select(*columns), filters).order_by(TeamDB.id)
+    yield from db.exec(query.execution_options(yield_per=batch_size)).mappings()
 
-    for field, value in filters.items():
-        if value:
-            query = query.where(getattr(TeamDB, field).contains(value))
 
-    return db.exec(query).all()
+def get_players_by_team_id(db: Session, team_id: int) -> list[Player] | None:
+    """
+    Gets team's players by team ID.
+    @param db:      Database session.
+    @param team_id: Identifier of the team.
+    @return:        List of active players of the team, or None if the team does not exist.
+    """
+    if get_team_by_id(db, team_id):
+        return db.exec(select(PlayerDB).where(PlayerDB.team_id == team_id).where(PlayerDB.is_active == True)).all()
 
 
 def update_team(db: Session, team_id: int, team_updates: TeamUpdates) -> Team:
     """
-    Gets a list with all teams availables or filtered by one parameter.
+    Updates an active team by ID with one UPDATE ... RETURNING statement.
     @param db:              Database session.
     @param team_id:         Identifier of the team.
     @param team_updates:    Object with fields and data to update.
-    @return:                Updated team by the given id.
+    @return:                Updated team by the given id, or None if it does not exist.
     """
-    if team := get_team_by_id(db, team_id):
-        update_data = team_updates.model_dump(exclude_unset=True)
+    update_data = team_updates.model_dump(exclude_unset=True)
+    if not update_data:
+        return get_team_by_id(db, team_id)
+
+    statement = update(TeamDB).where(TeamDB.id == team_id, TeamDB.is_active == True).values(**update_data)
+    if team := write_returning(db, statement, TeamDB, Team):
+        after_commit(db, partial(teams_cache.invalidate, team_id), partial(events.publish, 'teams', 'updated', team))
+    return team
 
-        for key, value in update_data.items():
-            setattr(team, key, value)
-        
-        db.commit()
-        db.refresh(team)
-        
-        return team
-    
 
 def delete_team(db: Session, team_id: int) -> Team:
     """
-    Deletes (inactivates) a team by ID.
+    Deletes (inactivates) a team by ID with one UPDATE ... RETURNING statement.
     @param db:      Database session.
     @param team_id: Identifier of the team.
+    @return:        Deleted team, or None if it does not exist.
     """
-    if team := get_team_by_id(db, team_id):
-        team.is_active = False
-        db.commit()
-        db.refresh(team)
-        return team
-    
\ No newline at end of file
+    statement = update(TeamDB).where(TeamDB.id == team_id, TeamDB.is_active == True).values(is_active=False)
+    if team := write_returning(db, statement, TeamDB, Team):
+        after_commit(db, partial(teams_cache.invalidate, team_id), partial(events.publish, 'teams', 'deleted', team))
+    return team
@@ -0,0 +1,48 @@
+"""
+Implements the single statement writes shared by the operations on the database.
+"""
+
+# Python imports.
+from functools import partial
+from typing import Callable
+from pydantic import BaseModel
+from sqlalchemy import Insert, Update
+from sqlmodel import Session, SQLModel
+
+# Project imports.
+from ..versions import bump_version, changing
+
+
+def after_commit(db: Session, *callbacks: Callable[[], None]) -> None:
+    """
+    Runs the side effects of a write (cache invalidation, events) once it is committed. The operations commit
+    their own transaction, so they run right away, except with the sessions of the group commit writer, which
+    only flush on commit() and run them after committing the whole batch.
+    @param db:          Database session.
+    @param callbacks:   Functions to call once the write is committed.
+    """
+    if (pending := db.info.get('after_commit')) is not None:
+        pending.extend(callbacks)
+    else:
+        for callback in callbacks:
+            callback()
+
+
+def write_returning(db: Session, statement: Insert | Update, table: type[SQLModel], model: type[BaseModel]) -> BaseModel | None:
+    """
+    Runs an INSERT or UPDATE statement that returns the written row in the same round trip, and commits it.
+    @param db:          Database session.
+    @param statement:   Insert or update statement.
+    @param table:       Database model of the table, whose version is changed.
+    @param model:       Model of the returned row, its fields are the returned columns.
+    @return:            Model of the row written, or None when no row matched.
+    """
+    columns = [getattr(table, field) for field in model.model_fields]
+    statement = statement.returning(*columns).execution_options(synchronize_session=False)
+    with changing(table.__tablename__):
+        row = db.exec(statement).mappings().first()
+        db.commit()
+    if 'after_commit' in db.info:
+        # The row is only flushed yet: the version changes again once the batch is committed.
+        after_commit(db, partial(bump_version, table.__tablename__))
+    return model(**row) if row else None
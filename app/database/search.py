@@ -0,0 +1,68 @@
+"""
+Implements the substring search over the text columns, backed by SQLite FTS5 trigram indexes.
+"""
+
+# Python imports.
+from sqlalchemy import Connection, column, table
+from sqlmodel import SQLModel, select
+
+
+# Searchable text columns by table. Each table has a {table}_fts virtual table kept in sync by triggers.
+SEARCH_COLUMNS = {
+    'players': ('firstname', 'lastname', 'nationality', 'position'),
+    'teams': ('name', 'country', 'city', 'stadium', 'color', 'coach'),
+}
+
+# Trigram indexes only match search terms with at least 3 characters.
+MIN_SEARCH_LENGTH = 3
+
+
+def search_table_ddl(table_name: str, columns: tuple[str]) -> list[str]:
+    """
+    Builds the statements creating the FTS5 table of a table and the triggers keeping it in sync.
+    @param table_name:  Name of the content table.
+    @param columns:     Searchable text columns of the table.
+    @return:            List of SQL statements.
+    """
+    fts = f'{table_name}_fts'
+    names = ', '.join(columns)
+    new_values = ', '.join(f'new.{name}' for name in columns)
+    old_values = ', '.join(f'old.{name}' for name in columns)
+    insert_new = f"INSERT INTO {fts}(rowid, {names}) VALUES (new.id, {new_values});"
+    delete_old = f"INSERT INTO {fts}({fts}, rowid, {names}) VALUES ('delete', old.id, {old_values});"
+    return [
+        f"CREATE VIRTUAL TABLE {fts} USING fts5({names}, content='{table_name}', content_rowid='id', tokenize='trigram')",
+        f"CREATE TRIGGER {fts}_insert AFTER INSERT ON {table_name} BEGIN {insert_new} END",
+        f"CREATE TRIGGER {fts}_delete AFTER DELETE ON {table_name} BEGIN {delete_old} END",
+        f"CREATE TRIGGER {fts}_update AFTER UPDATE OF {names} ON {table_name} BEGIN {delete_old} {insert_new} END",
+        f"INSERT INTO {fts}({fts}) VALUES ('rebuild')",
+    ]
+
+
+def create_search_tables(connection: Connection) -> None:
+    """
+    Creates the FTS5 tables and triggers that do not exist yet, indexing the rows already stored.
+    @param connection:  Database connection.
+    """
+    for table_name, columns in SEARCH_COLUMNS.items():
+        exists = connection.exec_driver_sql("SELECT 1 FROM sqlite_master WHERE name = ?", (f'{table_name}_fts',)).first()
+        if not exists:
+            for statement in search_table_ddl(table_name, columns):
+                connection.exec_driver_sql(statement)
+
+
+def contains(model: type[SQLModel], field: str, value: str):
+    """
+    Builds the condition matching the rows whose field contains the value, like LIKE '%value%' does.
+    The search goes through the trigram index when the value is long enough and falls back to LIKE otherwise.
+    @param model:   Database model of the table.
+    @param field:   Name of the text column.
+    @param value:   Substring to search.
+    @return:        SQL condition.
+    """
+    if len(value) < MIN_SEARCH_LENGTH:
+        return getattr(model, field).contains(value)
+
+    fts = table(f'{model.__tablename__}_fts', column('rowid'), column(field))
+    phrase = '"{}"'.format(value.replace('"', '""'))
+    return model.id.in_(select(fts.c.rowid).where(fts.c[field].match(phrase)))
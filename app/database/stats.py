@@ -0,0 +1,78 @@
+"""
+Implements the summary tables of the squad statistics, kept up to date by triggers on the players table.
+"""
+
+# Python imports.
+from sqlalchemy import Connection
+
+
+# Distributions counted by team in team_stats_facets, with the SQL expression of the value of a row.
+FACETS = {
+    'position': '{row}.position',
+    'nationality': '{row}.nationality',
+    'dorsal': 'CAST({row}.dorsal AS TEXT)',
+    'birth_year': "strftime('%Y', {row}.birthdate)",
+}
+
+# Columns of players that change the statistics.
+STATS_COLUMNS = 'team_id, is_active, height, position, nationality, dorsal, birthdate'
+
+
+def add_player_sql(row: str) -> str:
+    """
+    Builds the statements counting a player in the statistics of its team.
+    @param row: Alias of the player row in the trigger (new or old).
+    @return:    SQL statements.
+    """
+    facets = ', '.join(f"({row}.team_id, '{facet}', {value.format(row=row)}, 1)" for facet, value in FACETS.items())
+    return (f"INSERT INTO team_stats(team_id, player_count, height_sum) VALUES ({row}.team_id, 1, {row}.height) "
+            f"ON CONFLICT(team_id) DO UPDATE SET player_count = player_count + 1, height_sum = height_sum + excluded.height_sum; "
+            f"INSERT INTO team_stats_facets(team_id, facet, value, count) VALUES {facets} "
+            f"ON CONFLICT(team_id, facet, value) DO UPDATE SET count = count + 1;")
+
+
+def remove_player_sql(row: str) -> str:
+    """
+    Builds the statements discounting a player from the statistics of its team.
+    @param row: Alias of the player row in the trigger (new or old).
+    @return:    SQL statements.
+    """
+    facets = ', '.join(f"('{facet}', {value.format(row=row)})" for facet, value in FACETS.items())
+    return (f"UPDATE team_stats SET player_count = player_count - 1, height_sum = height_sum - {row}.height "
+            f"WHERE team_id = {row}.team_id; "
+            f"UPDATE team_stats_facets SET count = count - 1 WHERE team_id = {row}.team_id AND (facet, value) IN (VALUES {facets}); "
+            f"DELETE FROM team_stats_facets WHERE team_id = {row}.team_id AND count <= 0;")
+
+
+STATS_TRIGGERS = {
+    'team_stats_insert': f"AFTER INSERT ON players WHEN new.is_active BEGIN {add_player_sql('new')} END",
+    'team_stats_delete': f"AFTER DELETE ON players WHEN old.is_active BEGIN {remove_player_sql('old')} END",
+    'team_stats_update_old': f"AFTER UPDATE OF {STATS_COLUMNS} ON players WHEN old.is_active BEGIN {remove_player_sql('old')} END",
+    'team_stats_update_new': f"AFTER UPDATE OF {STATS_COLUMNS} ON players WHEN new.is_active BEGIN {add_player_sql('new')} END",
+}
+
+# Recomputes the summary tables from the players table with GROUP BY.
+REBUILD_STATS = [
+    "DELETE FROM team_stats",
+    "DELETE FROM team_stats_facets",
+    "INSERT INTO team_stats(team_id, player_count, height_sum) "
+    "SELECT team_id, COUNT(*), SUM(height) FROM players WHERE is_active = 1 GROUP BY team_id",
+    *(f"INSERT INTO team_stats_facets(team_id, facet, value, count) "
+      f"SELECT team_id, '{facet}', {value.format(row='players')}, COUNT(*) FROM players WHERE is_active = 1 "
+      f"GROUP BY team_id, {value.format(row='players')}" for facet, value in FACETS.items()),
+]
+
+
+def create_stats_triggers(connection: Connection) -> None:
+    """
+    Creates the triggers of the statistics that do not exist yet, computing the summary tables when they are created.
+    The summary tables themselves are created from the models.
+    @param connection:  Database connection.
+    """
+    existing = {name for name, in connection.exec_driver_sql("SELECT name FROM sqlite_master WHERE type = 'trigger'")}
+    missing = [name for name in STATS_TRIGGERS if name not in existing]
+    for name in missing:
+        connection.exec_driver_sql(f"CREATE TRIGGER {name} {STATS_TRIGGERS[name]}")
+    if missing:
+        for statement in REBUILD_STATS:
+            connection.exec_driver_sql(statement)
@@ -0,0 +1,47 @@
+"""
+Tracks a version counter per table, changed by the write operations to build the ETags of the responses.
+"""
+
+# Python imports.
+from collections import defaultdict
+from contextlib import contextmanager
+from threading import Lock
+from typing import Iterator
+
+
+_versions: dict[str, int] = defaultdict(int)
+_lock = Lock()
+
+
+def get_version(table: str) -> int:
+    """
+    Gets the current version of a table.
+    @param table:   Name of the table.
+    @return:        Version counter of the table.
+    """
+    return _versions[table]
+
+
+def bump_version(*tables: str) -> None:
+    """
+    Increments the version of the tables.
+    @param tables:  Names of the tables.
+    """
+    with _lock:
+        for table in tables:
+            _versions[table] += 1
+
+
+@contextmanager
+def changing(*tables: str) -> Iterator[None]:
+    """
+    Bumps the version of the tables before and after the block that commits their changes.
+    A response read while the commit was in progress is labelled with the intermediate version,
+    which is never current afterwards, so it cannot be confirmed as not modified.
+    @param tables:  Names of the tables written in the block.
+    """
+    bump_version(*tables)
+    try:
+        yield
+    finally:
+        bump_version(*tables)
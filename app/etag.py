@@ -0,0 +1,49 @@
+"""
+Implements the ETag and If-None-Match handling of the read endpoints.
+"""
+
+# Python imports.
+import hashlib, uuid
+from typing import Callable
+from fastapi import Request, Response, status, HTTPException
+
+# Project imports.
+from .database.versions import get_version
+
+
+# Versions restart with the process, so they are combined with an identifier of the process.
+PROCESS_ID = uuid.uuid4().hex
+
+
+def compute_etag(request: Request, tables: tuple[str]) -> str:
+    """
+    Computes the ETag of a response from the versions of the tables it reads and the requested URL.
+    @param request: Request object.
+    @param tables:  Names of the tables read by the endpoint.
+    @return:        Quoted ETag.
+    """
+    versions = ','.join(f'{table}:{get_version(table)}' for table in tables)
+    key = f'{PROCESS_ID}|{versions}|{request.url.path}?{request.url.query}'
+    return f'"{hashlib.sha1(key.encode()).hexdigest()}"'
+
+
+def etag_dependency(*tables: str, include: tuple[str] = ()) -> Callable:
+    """
+    Builds a dependency answering 304 Not Modified, before any query, when the client has the current version.
+    The ETag is only sent with successful responses: the errors raised by the handler (e.g. 404) are built without
+    the headers of the injected response, so a client never holds the ETag of a resource that does not exist.
+    The If-None-Match wildcard is not answered with 304, since the resource is not known to exist before the query.
+    @param tables:  Names of the tables read by the endpoint.
+    @param include: Names of the tables also read when requested by the include query parameter.
+    @return:        Dependency function.
+    """
+    def check_etag(request: Request, response: Response) -> None:
+        included = tuple(table for table in include if table == request.query_params.get('include'))
+        etag = compute_etag(request, tables + included)
+        if if_none_match := request.headers.get('If-None-Match'):
+            client_etags = {tag.strip().removeprefix('W/') for tag in if_none_match.split(',')}
+            if etag in client_etags:
+                raise HTTPException(status_code=status.HTTP_304_NOT_MODIFIED, headers={'ETag': etag})
+        response.headers['ETag'] = etag
+
+    return check_etag
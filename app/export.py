@@ -0,0 +1,62 @@
+"""
+Implements the streaming of rows as NDJSON or CSV for the export endpoints.
+"""
+
+# Python imports.
+import csv, io, json
+from typing import Callable, Iterator
+from fastapi.responses import StreamingResponse
+from sqlmodel import Session
+
+# Project imports.
+from settings import EXPORT_BATCH_SIZE
+from .database.database import read_engine
+
+
+MEDIA_TYPES = {'ndjson': 'application/x-ndjson', 'csv': 'text/csv'}
+
+
+def encode_rows(rows: Iterator[dict], fields: list[str], format: str) -> Iterator[str]:
+    """
+    Encodes the rows in the given format, yielding one chunk of text per batch of rows.
+    @param rows:    Iterator of rows as dictionaries.
+    @param fields:  Names of the columns to write.
+    @param format:  Output format, ndjson or csv.
+    @return:        Iterator of text chunks.
+    """
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=fields, extrasaction='ignore')
+    if format == 'csv':
+        writer.writeheader()
+
+    for count, row in enumerate(rows, start=1):
+        if format == 'csv':
+            writer.writerow(row)
+        else:
+            buffer.write(json.dumps({field: row[field] for field in fields}, default=str) + '\n')
+
+        if count % EXPORT_BATCH_SIZE == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+
+    yield buffer.getvalue()
+
+
+def export_response(iter_rows: Callable[[Session, dict], Iterator], filters: dict, fields: list[str], format: str, filename: str) -> StreamingResponse:
+    """
+    Streams the rows returned by an operation of the database.
+    The session is opened by the stream itself, since the one of the request is closed before the response is sent.
+    @param iter_rows:   Operation iterating over the rows (e.g. iter_players).
+    @param filters:     Dictionary with filters passed to the operation.
+    @param fields:      Names of the columns to write.
+    @param format:      Output format, ndjson or csv.
+    @param filename:    Name of the downloaded file, without extension.
+    @return:            Streaming response.
+    """
+    def stream() -> Iterator[str]:
+        with Session(read_engine) as session:
+            yield from encode_rows(iter_rows(session, filters), fields, format)
+
+    headers = {'Content-Disposition': f'attachment; filename="{filename}.{format}"'}
+    return StreamingResponse(stream(), media_type=MEDIA_TYPES[format], headers=headers)
@@ -4,23 +4,27 @@ Main script that runs the application.
 
 # Python imports.
 from fastapi import FastAPI, status
-from fastapi.responses import RedirectResponse
+from fastapi.responses import PlainTextResponse, RedirectResponse
 from contextlib import asynccontextmanager
 
 
 # Project imports.
-from .routers import auth, teams, players
-from .database.database import create_db_and_tables
+from settings import DEBUG, METRICS_ENABLED
+from . import metrics
+from .profiling import QueryHeadersMiddleware
+from .routers import auth, events, teams, players, stats
+from .database.database import create_db_and_tables, group_writer
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """
     Creates the database and their tables based on the models.
-    This runs when the server is up.
+    This runs when the server is up, and the writes queued to the group commit are finished when it stops.
     """
     create_db_and_tables()
     yield
+    group_writer.stop()
 
 
 app = FastAPI(lifespan=lifespan)
@@ -34,6 +38,23 @@ def root() -> dict:
     return RedirectResponse(url='/docs')
 
 
+if DEBUG:
+    app.add_middleware(QueryHeadersMiddleware)
+
+if METRICS_ENABLED:
+    app.add_middleware(metrics.MetricsMiddleware)
+
+    @app.get('/metrics', status_code=status.HTTP_200_OK, include_in_schema=False)
+    async def get_metrics() -> PlainTextResponse:
+        """
+        Request metrics in Prometheus text format.
+        Async so it renders on the event loop, the only thread updating the metrics.
+        """
+        return PlainTextResponse(metrics.render(), media_type=metrics.PROMETHEUS_MEDIA_TYPE)
+
+
 app.include_router(auth.router)
 app.include_router(teams.router)
 app.include_router(players.router)
+app.include_router(stats.router)
+app.include_router(events.router)
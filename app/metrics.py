@@ -0,0 +1,157 @@
+"""
+Request metrics: counts, latency, response size and database time by route, exposed in Prometheus text format.
+Metrics live in the memory of the process, so every worker of a multi-process server reports its own.
+"""
+
+# Python imports.
+import time
+from bisect import bisect_left
+from collections import defaultdict
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+# Project imports.
+from settings import METRICS_LATENCY_BUCKETS, METRICS_SIZE_BUCKETS
+from .database.cache import players_cache, teams_cache
+from .database.instrumentation import QueryStats, tracking_queries
+
+
+PROMETHEUS_MEDIA_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+class Histogram:
+    """
+    Histogram with fixed buckets, observations are counted in the first bucket whose bound is greater or equal.
+    """
+
+    def __init__(self, buckets: tuple):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+
+    def render(self, name: str, labels: str) -> list[str]:
+        """
+        Renders the buckets (cumulative), sum and count of the histogram.
+        @param name:    Metric name.
+        @param labels:  Rendered labels of the series, without braces.
+        @return:        Lines of the series.
+        """
+        lines, total = [], 0
+        for bound, count in zip([*map(str, self.buckets), '+Inf'], self.counts):
+            total += count
+            lines.append(f'{name}_bucket{{{labels},le="{bound}"}} {total}')
+        lines.append(f'{name}_sum{{{labels}}} {self.sum}')
+        lines.append(f'{name}_count{{{labels}}} {total}')
+        return lines
+
+
+class RouteMetrics:
+    """
+    Metrics of a route and method.
+    """
+
+    def __init__(self):
+        self.statuses = defaultdict(int)
+        self.latency = Histogram(METRICS_LATENCY_BUCKETS)
+        self.size = Histogram(METRICS_SIZE_BUCKETS)
+        self.db_time = Histogram(METRICS_LATENCY_BUCKETS)
+        self.queries = 0
+
+
+# Updated only from the event loop thread, so no lock is needed.
+routes: defaultdict[tuple[str, str], RouteMetrics] = defaultdict(RouteMetrics)
+in_progress: defaultdict[str, int] = defaultdict(int)
+
+
+def label(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def record(method: str, route: str, status: int, latency: float, size: int, stats: QueryStats) -> None:
+    """
+    Records a finished request.
+    @param method:  HTTP method.
+    @param route:   Path template of the route.
+    @param status:  Status code of the response.
+    @param latency: Seconds taken by the request, including the response body.
+    @param size:    Bytes of the response body.
+    @param stats:   Queries run by the request.
+    """
+    metrics = routes[method, route]
+    metrics.statuses[status] += 1
+    metrics.latency.observe(latency)
+    metrics.size.observe(size)
+    metrics.db_time.observe(stats.time)
+    metrics.queries += stats.count
+
+
+def render() -> str:
+    """
+    Renders all the metrics in Prometheus text format.
+    @return:    Metrics text.
+    """
+    lines = ['# HELP http_requests_total Requests handled, by route and status.', '# TYPE http_requests_total counter']
+    for (method, route), metrics in routes.items():
+        for status, count in metrics.statuses.items():
+            lines.append(f'http_requests_total{{method="{method}",route="{label(route)}",status="{status}"}} {count}')
+
+    for name, attribute, help in (('http_request_duration_seconds', 'latency', 'Request latency.'),
+                                  ('http_response_size_bytes', 'size', 'Response body size.'),
+                                  ('http_request_db_seconds', 'db_time', 'Time spent in database queries per request.')):
+        lines += [f'# HELP {name} {help}', f'# TYPE {name} histogram']
+        for (method, route), metrics in routes.items():
+            lines += getattr(metrics, attribute).render(name, f'method="{method}",route="{label(route)}"')
+
+    lines += ['# HELP db_queries_total Database queries run by requests.', '# TYPE db_queries_total counter']
+    for (method, route), metrics in routes.items():
+        lines.append(f'db_queries_total{{method="{method}",route="{label(route)}"}} {metrics.queries}')
+
+    lines += ['# HELP http_requests_in_progress Requests being handled.', '# TYPE http_requests_in_progress gauge']
+    lines += [f'http_requests_in_progress{{method="{method}"}} {count}' for method, count in in_progress.items()]
+
+    for name, type, help in (('hits', 'counter', 'Entity cache hits.'), ('misses', 'counter', 'Entity cache misses.'),
+                             ('size', 'gauge', 'Entries in the entity cache.')):
+        metric = f'entity_cache_{name}_total' if type == 'counter' else f'entity_cache_{name}'
+        lines += [f'# HELP {metric} {help}', f'# TYPE {metric} {type}']
+        lines += [f'{metric}{{cache="{cache}"}} {stats[name]}'
+                  for cache, stats in (('players', players_cache.stats()), ('teams', teams_cache.stats()))]
+    return '\n'.join(lines) + '\n'
+
+
+class MetricsMiddleware:
+    """
+    ASGI middleware that records the metrics of every HTTP request.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope['type'] != 'http':
+            return await self.app(scope, receive, send)
+
+        method = scope['method']
+        status, size = 500, 0
+
+        async def send_with_metrics(message: Message) -> None:
+            nonlocal status, size
+            if message['type'] == 'http.response.start':
+                status = message['status']
+            elif message['type'] == 'http.response.body':
+                size += len(message.get('body', b''))
+            await send(message)
+
+        with tracking_queries() as stats:
+            in_progress[method] += 1
+            start = time.perf_counter()
+            try:
+                await self.app(scope, receive, send_with_metrics)
+            finally:
+                latency = time.perf_counter() - start
+                in_progress[method] -= 1
+                # The router stores the matched route in the scope; unmatched paths share one series.
+                route = scope.get('route')
+                record(method, route.path if route else 'unmatched', status, latency, size, stats)
@@ -4,13 +4,42 @@ Script defining the Pydantic (SQLModel) and database models to Team.
 
 # Python imports.
 from sqlmodel import SQLModel, Field, Relationship
-from sqlalchemy import MetaData
-from datetime import date
+from sqlalchemy import Index, MetaData, text
+from datetime import date, datetime, timezone
 
 
 metadata = MetaData()
 
 
+def utc_now() -> datetime:
+    """
+    Current UTC time, stored without time zone.
+    """
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+def next_change_seq(table: str) -> dict:
+    """
+    Column arguments of the change sequence: every insert or update of a row takes the next value of its table.
+    SQLite has a single writer, so the subquery never returns the same value to two transactions.
+    @param table:   Name of the table.
+    @return:        Default and onupdate arguments of the column.
+    """
+    sequence = text(f'(SELECT COALESCE(MAX(change_seq), 0) + 1 FROM {table})')
+    return {'default': sequence, 'onupdate': sequence}
+
+
+def active_index(table: str, *columns: str) -> Index:
+    """
+    Partial index over the active rows, used by the list filters and sorts (which always filter on is_active).
+    SQLite stores the row ID in every index, so the index is also ordered by (columns, id) as the keyset needs.
+    @param table:   Name of the table.
+    @param columns: Indexed columns.
+    @return:        Index to declare in the table arguments.
+    """
+    return Index(f"ix_{table}_active_{'_'.join(columns)}", *columns, sqlite_where=text('is_active = 1'))
+
+
 class TeamBase(SQLModel):
     name: str = Field(index=True, max_length=30)
     country: str = Field(index=True, max_length=20)
@@ -33,10 +62,19 @@ class Team(TeamBase):
     id: int
 
 
+class TeamChange(Team):
+    is_active: bool
+    updated_at: datetime
+    change_seq: int
+
+
 class TeamDB(TeamBase, table=True, metadata=metadata):
     __tablename__ = 'teams'
+    __table_args__ = (active_index('teams', 'name'),)
     id: int | None = Field(default=None, primary_key=True)
     is_active: bool = Field(default=True)
+    updated_at: datetime | None = Field(default_factory=utc_now, sa_column_kwargs={'onupdate': utc_now})
+    change_seq: int | None = Field(default=None, index=True, sa_column_kwargs=next_change_seq('teams'))
     players: list['PlayerDB'] = Relationship(back_populates='team')
 
 
@@ -66,9 +104,70 @@ class Player(PlayerBase):
     id: int
 
 
+class PlayerBulkUpdates(PlayerUpdates):
+    id: int
+
+
 class PlayerDB(PlayerBase, table=True, metadata=metadata):
     __tablename__ = 'players'
+    __table_args__ = (active_index('players', 'birthdate'), active_index('players', 'height'),
+                      active_index('players', 'dorsal'), active_index('players', 'team_id', 'dorsal'))
     id: int | None = Field(default=None, primary_key=True)
     is_active: bool = Field(default=True)
+    updated_at: datetime | None = Field(default_factory=utc_now, sa_column_kwargs={'onupdate': utc_now})
+    change_seq: int | None = Field(default=None, index=True, sa_column_kwargs=next_change_seq('players'))
     team_id: int = Field(default=None, foreign_key='teams.id')
-    team: TeamDB = Relationship(back_populates='players')
\ No newline at end of file
+    team: TeamDB = Relationship(back_populates='players')
+
+
+class PlayerChange(Player):
+    is_active: bool
+    updated_at: datetime
+    change_seq: int
+
+
+class TeamWithPlayers(Team):
+    players: list[Player]
+
+
+class TeamStatsDB(SQLModel, table=True, metadata=metadata):
+    __tablename__ = 'team_stats'
+    team_id: int = Field(primary_key=True)
+    player_count: int = Field(default=0)
+    height_sum: float = Field(default=0)
+
+
+class TeamStatsFacetDB(SQLModel, table=True, metadata=metadata):
+    __tablename__ = 'team_stats_facets'
+    team_id: int = Field(primary_key=True)
+    facet: str = Field(primary_key=True, max_length=20)
+    value: str = Field(primary_key=True, max_length=30)
+    count: int = Field(default=0)
+
+
+class SquadStats(SQLModel):
+    player_count: int
+    average_height: float | None
+    ages: dict[int, int]
+    positions: dict[str, int]
+    nationalities: dict[str, int]
+    dorsals: dict[int, int]
+
+
+class TeamStats(SquadStats):
+    team_id: int
+
+
+class BulkRowError(SQLModel):
+    index: int
+    detail: list[dict]
+
+
+class BulkCreateResult(SQLModel):
+    ids: list[int]
+    errors: list[BulkRowError]
+
+
+class BulkUpdateResult(SQLModel):
+    ids: list[int]
+    missing: list[int]
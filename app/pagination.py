@@ -0,0 +1,129 @@
+"""
+Implements the opaque cursors used by the keyset pagination of the list endpoints, and the lookups by IDs.
+"""
+
+# Python imports.
+import base64, binascii, json
+from typing import Any
+from fastapi import Response, status, HTTPException
+from pydantic import BaseModel, TypeAdapter, ValidationError
+
+# Project imports.
+from settings import MAX_PAGE_SIZE
+from .responses import field_value
+
+
+def encode_cursor(position: dict) -> str:
+    """
+    Encodes the position of the last row of a page into an opaque cursor.
+    @param position:    Dictionary with the keys of the last row returned.
+    @return:            URL safe cursor string.
+    """
+    data = json.dumps(position, separators=(',', ':'), default=str).encode()
+    return base64.urlsafe_b64encode(data).decode().rstrip('=')
+
+
+def decode_cursor(cursor: str, keys: tuple[str, ...] = ('id',)) -> dict:
+    """
+    Decodes a cursor generated by encode_cursor.
+    @param cursor:  Cursor string received from the client.
+    @param keys:    Integer keys the cursor must have.
+    @return:        Dictionary with the keys of the last row of the previous page.
+    """
+    try:
+        position = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+        if isinstance(position, dict) and all(isinstance(position.get(key), int) for key in keys):
+            return position
+    except (binascii.Error, ValueError):
+        pass
+    raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail='Invalid cursor')
+
+
+def decode_sorted_cursor(cursor: str, sort: str, model: type[BaseModel]) -> tuple[int, Any]:
+    """
+    Decodes a cursor generated by paginate for a sorted list, which must be requested with the same sort.
+    @param cursor:  Cursor string received from the client.
+    @param sort:    Sort requested by the client, a field of the model with a leading - for the descending order.
+    @param model:   Response model of the route, which gives the type of the sort field.
+    @return:        ID and value of the sort field of the last row of the previous page.
+    """
+    position = decode_cursor(cursor)
+    key = sort.removeprefix('-')
+    if position.get('sort', 'id') == sort:
+        if key == 'id':
+            return position['id'], None
+        try:
+            return position['id'], TypeAdapter(model.model_fields[key].annotation).validate_python(position.get('value'))
+        except ValidationError:
+            pass
+    raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail='Invalid cursor')
+
+
+def paginate(response: Response, rows: list, limit: int, sort: str = 'id') -> list:
+    """
+    Trims a page fetched with one extra row and sets the next cursor header when there are more rows.
+    @param response:    Response object where the X-Next-Cursor header is set.
+    @param rows:        Rows fetched with limit + 1.
+    @param limit:       Page size requested by the client.
+    @param sort:        Sort of the rows, whose field value is kept in the cursor with the ID.
+    @return:            Rows of the current page.
+    """
+    if len(rows) > limit:
+        rows = rows[:limit]
+        position, key = {'id': field_value(rows[-1], 'id')}, sort.removeprefix('-')
+        if sort != 'id':
+            position['sort'] = sort
+        if key != 'id':
+            position['value'] = field_value(rows[-1], key)
+        response.headers['X-Next-Cursor'] = encode_cursor(position)
+    return rows
+
+
+def paginate_changes(response: Response, rows: list, limit: int, since: str | None) -> list:
+    """
+    Trims a page of the change feed fetched with one extra row and always sets the X-Next-Cursor header, with the
+    position of the last row or the received one when there are no changes, so clients can poll it later.
+    The X-Has-More header tells whether more changes are available right now.
+    @param response:    Response object where the headers are set.
+    @param rows:        Rows fetched with limit + 1.
+    @param limit:       Page size requested by the client.
+    @param since:       Cursor received from the client.
+    @return:            Rows of the current page.
+    """
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    if rows:
+        since = encode_cursor({'change_seq': rows[-1].change_seq, 'id': rows[-1].id})
+    if since:
+        response.headers['X-Next-Cursor'] = since
+    response.headers['X-Has-More'] = 'true' if has_more else 'false'
+    return rows
+
+
+def parse_ids(ids: str) -> list[int]:
+    """
+    Parses a comma separated list of IDs, removing the duplicates.
+    @param ids: IDs received from the client.
+    @return:    Identifiers in the requested order.
+    """
+    try:
+        parsed = list(dict.fromkeys(int(id) for id in ids.split(',') if id.strip()))
+    except ValueError:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail='Invalid ids')
+    if len(parsed) > MAX_PAGE_SIZE:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f'At most {MAX_PAGE_SIZE} ids are allowed')
+    return parsed
+
+
+def report_missing(response: Response, ids: list[int], rows: list) -> list:
+    """
+    Sets the X-Missing-Ids header with the requested IDs that were not found.
+    @param response:    Response object where the header is set.
+    @param ids:         Requested identifiers.
+    @param rows:        Rows found.
+    @return:            Rows found.
+    """
+    found = {field_value(row, 'id') for row in rows}
+    if missing := [str(id) for id in ids if id not in found]:
+        response.headers['X-Missing-Ids'] = ','.join(missing)
+    return rows
@@ -0,0 +1,34 @@
+"""
+Query profiling headers for debugging: the number of queries and the time spent in them by every request.
+"""
+
+# Python imports.
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+# Project imports.
+from .database.instrumentation import tracking_queries
+
+
+class QueryHeadersMiddleware:
+    """
+    ASGI middleware that adds the X-Query-Count and X-DB-Time (milliseconds) headers to every HTTP response.
+    Queries run after the headers are sent, while streaming the body, are not included.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope['type'] != 'http':
+            return await self.app(scope, receive, send)
+
+        with tracking_queries() as stats:
+            async def send_with_headers(message: Message) -> None:
+                if message['type'] == 'http.response.start':
+                    headers = MutableHeaders(scope=message)
+                    headers.append('X-Query-Count', str(stats.count))
+                    headers.append('X-DB-Time', f'{stats.time * 1000:.3f}')
+                await send(message)
+
+            await self.app(scope, receive, send_with_headers)
@@ -0,0 +1,96 @@
+"""
+Implements the fast JSON response path and the sparse fieldsets of the list and detail endpoints.
+"""
+
+# Python imports.
+import orjson
+from collections.abc import Mapping
+from typing import Any
+from fastapi import Response, status, HTTPException
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
+
+# Project imports.
+from settings import FAST_RESPONSES
+
+
+class FastJSONResponse(JSONResponse):
+    """
+    JSON response rendered with orjson. Nested models (e.g. the players of a team) are dumped by pydantic.
+    """
+
+    def render(self, content: Any) -> bytes:
+        return orjson.dumps(content, default=dump_model, option=orjson.OPT_NON_STR_KEYS)
+
+
+def dump_model(value: Any) -> dict:
+    """
+    Converts the values orjson does not serialize natively.
+    @param value:   Value to convert.
+    @return:        Serializable value.
+    """
+    if isinstance(value, BaseModel):
+        return value.model_dump()
+    raise TypeError(f'Type is not JSON serializable: {type(value).__name__}')
+
+
+def parse_fields(fields: str | None, model: type[BaseModel]) -> list[str] | None:
+    """
+    Parses a comma separated list of fields requested by the client. The ID is always included.
+    @param fields:  Fields received from the client, or None to get all of them.
+    @param model:   Response model of the route.
+    @return:        List of fields in the requested order, or None when no fields were requested.
+    """
+    if fields is None:
+        return None
+    requested = list(dict.fromkeys(['id', *(field.strip() for field in fields.split(',') if field.strip())]))
+    if invalid := [field for field in requested if field not in model.model_fields]:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Invalid fields: {', '.join(invalid)}")
+    return requested
+
+
+def fast_fields(model: type[BaseModel], fields: list[str] = None) -> list[str] | None:
+    """
+    Gets the columns the list operations select: the requested fields, or all the fields of the model when
+    FAST_RESPONSES is enabled, so they return plain rows.
+    @param model:   Response model of the route.
+    @param fields:  Fields requested by the client.
+    @return:        List of fields, or None to get database objects.
+    """
+    return fields or (list(model.model_fields) if FAST_RESPONSES else None)
+
+
+def field_value(row: Any, field: str) -> Any:
+    """
+    Gets a field of a row returned by the operations: a mapping when columns were selected, or an object (database
+    object or model) otherwise.
+    @param row:     Row returned by an operation.
+    @param field:   Name of the field.
+    @return:        Value of the field.
+    """
+    return row[field] if isinstance(row, Mapping) else getattr(row, field)
+
+
+def fast_response(content: Any, model: type[BaseModel], response: Response, fields: list[str] = None) -> Any:
+    """
+    Serializes the rows directly with orjson when FAST_RESPONSES is enabled or only some fields were requested,
+    instead of validating them against the response model and encoding them with the standard encoder.
+    The route keeps its return type for the OpenAPI schema.
+    @param content:     Object or list of objects (database objects, rows or models) returned by the operation.
+    @param model:       Response model whose fields are written.
+    @param response:    Response of the route, whose headers (e.g. ETag) are kept.
+    @param fields:      Fields written instead of all the fields of the model.
+    @return:            FastJSONResponse, or the content itself when the mode is disabled and no fields were requested.
+    """
+    if not FAST_RESPONSES and not fields:
+        return content
+
+    fields = fields or list(model.model_fields)
+    if isinstance(content, list):
+        data = [{field: field_value(row, field) for field in fields} for row in content]
+    else:
+        data = {field: field_value(content, field) for field in fields}
+
+    fast = FastJSONResponse(data, status_code=response.status_code or 200)
+    fast.headers.raw.extend(response.headers.raw)
+    return fast
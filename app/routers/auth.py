@@ -3,36 +3,67 @@ Auth script for the application.
 """
 
 # Python imports.
-import os, jwt
+import os, jwt, time
+from collections import OrderedDict
+from threading import Lock
 from dotenv import load_dotenv
 from fastapi import Request
 from fastapi import APIRouter, Body, status, HTTPException
 
 # Project imports.
-from settings import DEBUG
+from settings import DEBUG, TOKEN_EXPIRE_MINUTES, TOKEN_CACHE_SIZE
 
 
 load_dotenv('.env' if not DEBUG else '.env.dev')
-users: list[dict] = [{"username": os.getenv('USER'), "password": os.getenv('PASSWORD')}]
+SECRET_KEY = os.getenv('SECRET_KEY')
+users: dict[str, dict] = {os.getenv('USER'): {"username": os.getenv('USER'), "password": os.getenv('PASSWORD')}}
+
+# Tokens already verified, with the time (epoch seconds) they expire.
+verified_tokens: OrderedDict[str, float] = OrderedDict()
+verified_tokens_lock = Lock()
 
 
 router = APIRouter(prefix='/auth', tags=['Auth'])
 
 
+def decode_token(token: str) -> float | None:
+    """
+    Decodes a token and checks it belongs to a user.
+    @param token:   JWT token.
+    @return:        Time the token expires (tokens without exp are kept TOKEN_EXPIRE_MINUTES), or None if it is not valid.
+    """
+    try:
+        data = jwt.decode(token, SECRET_KEY, algorithms=['HS256'])
+    except jwt.InvalidTokenError:
+        return None
+    if (user := users.get(data.get('username'))) and user['password'] == data.get('password'):
+        return data.get('exp', time.time() + TOKEN_EXPIRE_MINUTES * 60)
+
+
 def verify_token(request: Request) -> bool:
     """
     Verifies if the user is authorized to access the endpoint.
+    Verified tokens are cached until they expire, so repeated calls skip the signature verification.
     @param request: Request object.
     """
     if token := request.headers.get('Authorization'):
-        try:
-            token = token.split(' ')[-1]
-            data = jwt.decode(token, os.getenv('SECRET_KEY'), algorithms=['HS256'])
-            if user := next(filter(lambda u: u['username'] == data['username'], users), None):
-                if user == data:
-                    return True
-        except:
-            pass
+        token = token.split(' ')[-1]
+        now = time.time()
+
+        with verified_tokens_lock:
+            expires_at = verified_tokens.get(token)
+        if expires_at is not None:
+            if expires_at > now:
+                return True
+            with verified_tokens_lock:
+                verified_tokens.pop(token, None)
+
+        if (expires_at := decode_token(token)) and expires_at > now:
+            with verified_tokens_lock:
+                verified_tokens[token] = expires_at
+                if len(verified_tokens) > TOKEN_CACHE_SIZE:
+                    verified_tokens.popitem(last=False)
+            return True
     return False
 
 
@@ -52,7 +83,8 @@ def login_user(username: str = Body(), password: str = Body()) -> dict:
     - **username**:    Username of the user.
     - **password**:    Password of the user.    
     """
-    if user := next(filter(lambda u: u['username'] == username, users), None):
+    if user := users.get(username):
         if user['password'] == password:
-            return {'token': f"Bearer {jwt.encode(user, os.getenv('SECRET_KEY'), algorithm='HS256')}"}
+            payload = {**user, 'exp': int(time.time()) + TOKEN_EXPIRE_MINUTES * 60}
+            return {'token': f"Bearer {jwt.encode(payload, SECRET_KEY, algorithm='HS256')}"}
     raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail='Invalid data!')
@@ -0,0 +1,62 @@
+"""
+Implements the router streaming the changes of players and teams as Server-Sent Events.
+"""
+
+# Python imports.
+import asyncio
+from typing import AsyncIterator, Literal
+from fastapi import APIRouter, Header, Query, status
+from fastapi.responses import StreamingResponse
+
+# Project imports.
+from settings import EVENTS_KEEPALIVE
+from ..database.events import events
+
+
+router = APIRouter(prefix='/events', tags=['Events'])
+
+
+async def event_stream(last_event_id: str | None, entities: set[str] | None) -> AsyncIterator[bytes]:
+    """
+    Subscribes to the broker and streams the events until the client disconnects or the subscriber is dropped.
+    The subscriber is registered once the body starts streaming, so a client disconnecting before is never left
+    registered. The missed events are replayed first, or a reset event asks the client to resync.
+    @param last_event_id:   ID of the last event received by the client, to resume after it.
+    @param entities:        Entities whose events are streamed, or None for all of them.
+    @return:                Iterator of the Server-Sent Events messages.
+    """
+    subscriber, missed = events.subscribe(last_event_id, entities)
+    try:
+        yield f'retry: {EVENTS_KEEPALIVE * 1000}\n\n'.encode()
+        if missed is None:
+            yield b'event: reset\ndata: {}\n\n'
+        for event in missed or []:
+            yield event.message
+
+        while True:
+            try:
+                event = await asyncio.wait_for(subscriber.queue.get(), EVENTS_KEEPALIVE)
+            except asyncio.TimeoutError:
+                # Comments keep proxies from closing an idle connection.
+                yield b': keepalive\n\n'
+                continue
+            if event is None:
+                break
+            yield event.message
+    finally:
+        events.unsubscribe(subscriber)
+
+
+@router.get('/', status_code=status.HTTP_200_OK, response_class=StreamingResponse)
+async def stream_events(entity: Literal['players', 'teams'] = Query(default=None),
+                        last_event_id: str = Header(default=None)) -> StreamingResponse:
+    """
+    Streams the players and teams created, updated and deleted as Server-Sent Events (text/event-stream).
+    Events are named "<entity>.<action>" and carry the entity as JSON data. Reconnecting clients send the
+    Last-Event-ID header to receive the events they missed; when they cannot be replayed, a "reset" event is sent
+    first and the client should resync with the /players/changes and /teams/changes feeds.
+    - **entity**:           Only stream the events of players or teams.
+    - **last_event_id**:    ID of the last event received, to resume the stream after it.
+    """
+    return StreamingResponse(event_stream(last_event_id, {entity} if entity else None), media_type='text/event-stream',
+                             headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
@@ -3,77 +3,201 @@ Implements the router in charge of player management.
 """
 
 # Python imports.
+from datetime import date
+from typing import Literal
 from sqlmodel import Session
-from fastapi import APIRouter, Depends, Body, Path, Query, Security, status, HTTPException
+from sqlmodel.ext.asyncio.session import AsyncSession
+from fastapi.responses import StreamingResponse
+from fastapi import APIRouter, Depends, Body, Path, Query, Response, Security, status, HTTPException
 
 # Project imports.
+from settings import PAGE_SIZE, MAX_PAGE_SIZE
 from .auth import verify_token_dependency
-from ..database.database import get_session
+from ..etag import etag_dependency
+from ..export import export_response
+from ..bulk import bulk_openapi, read_bulk_rows, validate_bulk_rows, bulk_result
+from ..pagination import decode_cursor, decode_sorted_cursor, paginate, paginate_changes, parse_ids, report_missing
+from ..responses import fast_fields, fast_response, parse_fields
+from ..database.database import get_db_session, get_read_db_session, run_operation, run_write
 from ..database.operations import players as db_players
-from ..models import Player, PlayerBase, PlayerUpdates
+from ..models import Player, PlayerChange, PlayerBase, PlayerUpdates, PlayerBulkUpdates, BulkCreateResult, BulkUpdateResult
 
 
 router = APIRouter(prefix='/players', tags=['Players'])
 
+# Sorts of the players list, each one backed by an index over the active players.
+PlayerSort = Literal['id', '-id', 'birthdate', '-birthdate', 'height', '-height', 'dorsal', '-dorsal']
+
 
 @router.post('/', status_code=status.HTTP_201_CREATED, dependencies=[Depends(verify_token_dependency)])
-def create_player(player_data: PlayerBase = Body(), db_session: Session = Depends(get_session)) -> Player:
+async def create_player(player_data: PlayerBase = Body(), db_session: Session | AsyncSession = Depends(get_db_session)) -> Player:
     """
     Creates a new player in the database.
     - **player_data**:  Player object to be added into the database.
     """
-    return db_players.create_player(db_session, player_data)
+    return await run_write(db_session, db_players.create_player, player_data)
 
 
-@router.get('/{player_id}/', status_code=status.HTTP_200_OK)
-def get_player_by_id(player_id: int = Path(), db_session: Session = Depends(get_session)) -> Player:
+@router.post('/bulk', status_code=status.HTTP_201_CREATED, dependencies=[Depends(verify_token_dependency)],
+             openapi_extra=bulk_openapi('PlayerBase'))
+async def create_players_bulk(rows: list = Depends(read_bulk_rows), db_session: Session | AsyncSession = Depends(get_db_session)) -> BulkCreateResult:
+    """
+    Creates many players in the database with batched inserts.
+    The body is a JSON array or NDJSON (one player per line); invalid rows are reported without stopping the others.
+    - **rows**:         Player objects to be added into the database.
+    """
+    valid, errors = validate_bulk_rows(rows, PlayerBase)
+    ids, db_errors = await run_operation(db_session, db_players.create_players, [player for _, player in valid])
+    return bulk_result(valid, ids, db_errors, errors)
+
+
+@router.get('/export', status_code=status.HTTP_200_OK, response_class=StreamingResponse)
+def export_players(format: Literal['ndjson', 'csv'] = Query(default='ndjson'),
+                   firstname: str = Query(default=None),
+                   lastname: str = Query(default=None),
+                   nationality: str = Query(default=None),
+                   position: str = Query(default=None)) -> StreamingResponse:
+    """
+    Exports all players availables or filtered by one parameter, streaming them as NDJSON or CSV.
+    - **format**:       Output format, ndjson or csv.
+    - **firstname**:    Player firstname to filter.
+    - **lastname**:     Player lastname to filter.
+    - **nationality**:  Player nationality to filter.
+    - **position**:     Player position to filter.
+    """
+    filters = {"firstname": firstname, "lastname": lastname, "nationality": nationality, "position": position}
+    return export_response(db_players.iter_players, filters, list(Player.model_fields), format, 'players')
+
+
+@router.get('/changes', status_code=status.HTTP_200_OK, dependencies=[Depends(etag_dependency('players'))])
+async def get_player_changes(response: Response,
+                             db_session: Session | AsyncSession = Depends(get_read_db_session),
+                             since: str = Query(default=None),
+                             limit: int = Query(default=PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE)) -> list[PlayerChange]:
+    """
+    Gets the players created, updated or deleted (inactivated, is_active false) since a cursor, oldest change first.
+    The X-Next-Cursor header is always returned to ask for the following changes, and X-Has-More tells whether
+    they are already available.
+    - **since**:        Cursor returned by the previous call, or none to get all the players.
+    - **limit**:        Maximum number of players returned.
+    """
+    after = decode_cursor(since, ('change_seq', 'id')) if since else None
+    players = await run_operation(db_session, db_players.get_player_changes, limit + 1, after and (after['change_seq'], after['id']))
+    return paginate_changes(response, players, limit, since)
+
+
+@router.get('/{player_id}/', status_code=status.HTTP_200_OK, dependencies=[Depends(etag_dependency('players'))])
+async def get_player_by_id(response: Response,
+                           player_id: int = Path(),
+                           fields: str = Query(default=None),
+                           db_session: Session | AsyncSession = Depends(get_read_db_session)) -> Player:
     """
     Gets a player by ID.
     - **player_id**:    Identifier of the player.
+    - **fields**:       Comma separated fields to return (the ID is always returned).
     """
-    if player := db_players.get_player_by_id(db_session, player_id):
-        return player
+    fields = parse_fields(fields, Player)
+    if player := await run_operation(db_session, db_players.get_player_by_id, player_id):
+        return fast_response(player, Player, response, fields)
     raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Player not found")
 
 
-@router.get('/', status_code=status.HTTP_200_OK)
-def get_players(db_session: Session = Depends(get_session),
-                firstname: str = Query(default=None),
-                lastname: str = Query(default=None),
-                nationality: str = Query(default=None),
-                position: str = Query(default=None)) -> list[Player]:
+@router.get('/', status_code=status.HTTP_200_OK, dependencies=[Depends(etag_dependency('players'))])
+async def get_players(response: Response,
+                      db_session: Session | AsyncSession = Depends(get_read_db_session),
+                      firstname: str = Query(default=None),
+                      lastname: str = Query(default=None),
+                      nationality: str = Query(default=None),
+                      position: str = Query(default=None),
+                      team_id: int = Query(default=None),
+                      is_active: bool = Query(default=True),
+                      birthdate_min: date = Query(default=None),
+                      birthdate_max: date = Query(default=None),
+                      height_min: float = Query(default=None),
+                      height_max: float = Query(default=None),
+                      dorsal_min: int = Query(default=None),
+                      dorsal_max: int = Query(default=None),
+                      sort: PlayerSort = Query(default='id'),
+                      limit: int = Query(default=PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+                      cursor: str = Query(default=None),
+                      ids: str = Query(default=None),
+                      fields: str = Query(default=None)) -> list[Player]:
     """
-    Gets a list with all players availables or filtered by one parameter.
+    Gets a page of players availables or filtered by one or more parameters, ordered by ID or the sort field.
+    The cursor of the next page is returned in the X-Next-Cursor header, and only works with the same sort.
+    The ranges (min and max) are inclusive.
+    With ids, the players of those IDs are returned in the requested order instead, and the IDs not found are
+    returned in the X-Missing-Ids header.
     - **firstname**:    Player firstname to filter.
     - **lastname**:     Player lastname to filter.
     - **nationality**:  Player nationality to filter.
     - **position**:     Player position to filter.
+    - **team_id**:      Identifier of the team of the players.
+    - **is_active**:    Use false to get the deleted (inactivated) players instead.
+    - **birthdate_min**: Earliest birthdate of the players.
+    - **birthdate_max**: Latest birthdate of the players.
+    - **height_min**:   Minimum height of the players.
+    - **height_max**:   Maximum height of the players.
+    - **dorsal_min**:   Minimum dorsal of the players.
+    - **dorsal_max**:   Maximum dorsal of the players.
+    - **sort**:         Field to sort by (id, birthdate, height or dorsal), with a leading - for the descending order.
+    - **limit**:        Maximum number of players in the page.
+    - **cursor**:       Cursor returned by the previous page.
+    - **ids**:          Comma separated player identifiers to get (the filters, sort and pagination are ignored).
+    - **fields**:       Comma separated fields to return (the ID is always returned), only those columns are read.
     """
-    filters = {"firstname": firstname, "lastname": lastname, "nationality": nationality, "position": position}
-    players = db_players.get_players(db_session, filters)
+    fields = parse_fields(fields, Player)
+    if ids is not None:
+        player_ids = parse_ids(ids)
+        players = await run_operation(db_session, db_players.get_players_by_ids, player_ids, fast_fields(Player, fields))
+        return fast_response(report_missing(response, player_ids, players), Player, response, fields)
+
+    filters = {"firstname": firstname, "lastname": lastname, "nationality": nationality, "position": position,
+               "team_id": team_id, "is_active": is_active, "birthdate_min": birthdate_min, "birthdate_max": birthdate_max,
+               "height_min": height_min, "height_max": height_max, "dorsal_min": dorsal_min, "dorsal_max": dorsal_max}
+    after_id, after_value = decode_sorted_cursor(cursor, sort, Player) if cursor else (None, None)
+    # The sort field is selected too, as the next cursor is built from it.
+    columns = fast_fields(Player, fields)
+    if columns and sort.removeprefix('-') not in columns:
+        columns = [*columns, sort.removeprefix('-')]
+    players = await run_operation(db_session, db_players.get_players, filters, limit + 1, after_id, columns, sort, after_value)
     if players or players == []:
-        return players
+        return fast_response(paginate(response, players, limit, sort), Player, response, fields)
     raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail='Failed request')
 
 
+@router.patch('/bulk', status_code=status.HTTP_200_OK, dependencies=[Depends(verify_token_dependency)])
+async def update_players_bulk(players_updates: list[PlayerBulkUpdates] = Body(), db_session: Session | AsyncSession = Depends(get_db_session)) -> BulkUpdateResult:
+    """
+    Updates many players by id in one transaction, e.g. the transfers of a window.
+    Nothing is updated when a target team does not exist; players not found are returned in missing.
+    - **players_updates**:  Objects with the id of the player and the fields and data to update.
+    """
+    ids, missing, invalid_teams = await run_operation(db_session, db_players.update_players, players_updates)
+    if invalid_teams:
+        raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                            detail=f"Team not found: {', '.join(map(str, invalid_teams))}")
+    return BulkUpdateResult(ids=ids, missing=missing)
+
+
 @router.patch('/{player_id}/', status_code=status.HTTP_200_OK, dependencies=[Depends(verify_token_dependency)])
-def update_player(player_id: int = Path(), player_updates: PlayerUpdates = Body(), db_session: Session = Depends(get_session)) -> Player:
+async def update_player(player_id: int = Path(), player_updates: PlayerUpdates = Body(), db_session: Session | AsyncSession = Depends(get_db_session)) -> Player:
     """
     Updates a player by id.
     - **player_id**:        Identifier of the player.
     - **player_updates**:   Object with fields and data to update.
     """
-    if player := db_players.update_player(db_session, player_id, player_updates):
+    if player := await run_write(db_session, db_players.update_player, player_id, player_updates):
         return player
     raise HTTPException(status_code=404, detail="Player not found")
     
 
 @router.delete('/{player_id}/', status_code=status.HTTP_200_OK, dependencies=[Security(verify_token_dependency)])
-def delete_player(player_id: int = Path(), db_session: Session = Depends(get_session)) -> Player:
+async def delete_player(player_id: int = Path(), db_session: Session | AsyncSession = Depends(get_db_session)) -> Player:
     """
     Deletes (inactivates) a player by ID.
     - **player_id**:    Identifier of the player.
     """
-    if player := db_players.delete_player(db_session, player_id):
+    if player := await run_write(db_session, db_players.delete_player, player_id):
         return player
     raise HTTPException(status_code=404, detail="Player not found")
@@ -0,0 +1,25 @@
+"""
+Implements the router in charge of the league statistics.
+"""
+
+# Python imports.
+from fastapi import APIRouter, Depends, status
+from sqlmodel import Session
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+# Project imports.
+from ..etag import etag_dependency
+from ..database.database import get_read_db_session, run_operation
+from ..database.operations import stats as db_stats
+from ..models import SquadStats
+
+
+router = APIRouter(prefix='/stats', tags=['Stats'])
+
+
+@router.get('/', status_code=status.HTTP_200_OK, dependencies=[Depends(etag_dependency('players'))])
+async def get_league_stats(db_session: Session | AsyncSession = Depends(get_read_db_session)) -> SquadStats:
+    """
+    Gets the statistics of all active players: average height and distributions of ages, positions, nationalities and dorsals.
+    """
+    return await run_operation(db_session, db_stats.get_league_stats)
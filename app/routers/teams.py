@@ -3,14 +3,24 @@ Implements the router in charge of team management.
 """
 
 # Python imports.
-from fastapi import APIRouter, Depends, Body, Path, Query, status, HTTPException
+from fastapi import APIRouter, Depends, Body, Path, Query, Response, status, HTTPException
 from sqlmodel import Session
+from sqlmodel.ext.asyncio.session import AsyncSession
+from fastapi.responses import StreamingResponse
+from typing import Literal
 
 # Project imports.
+from settings import PAGE_SIZE, MAX_PAGE_SIZE
 from .auth import verify_token_dependency
-from ..database.database import get_session
+from ..etag import etag_dependency
+from ..export import export_response
+from ..bulk import bulk_openapi, read_bulk_rows, validate_bulk_rows, bulk_result
+from ..pagination import decode_cursor, decode_sorted_cursor, paginate, paginate_changes, parse_ids, report_missing
+from ..responses import fast_fields, fast_response, parse_fields
+from ..database.database import get_db_session, get_read_db_session, run_operation, run_write
 from ..database.operations import teams as db_teams
-from ..models import TeamBase, Team, TeamUpdates, Player
+from ..database.operations import stats as db_stats
+from ..models import TeamBase, Team, TeamChange, TeamUpdates, TeamWithPlayers, TeamStats, Player, BulkCreateResult
 
 
 
@@ -18,78 +28,193 @@ router = APIRouter(prefix='/teams', tags=['Teams'])
 
 
 @router.post('/', status_code=status.HTTP_201_CREATED, dependencies=[Depends(verify_token_dependency)])
-def create_team(team_data: TeamBase = Body(), db_session: Session = Depends(get_session)) -> Team:
+async def create_team(team_data: TeamBase = Body(), db_session: Session | AsyncSession = Depends(get_db_session)) -> Team:
     """
     Creates a new team in the database.
     - **team_data**:    Team object to be added into the database.
     """
-    return db_teams.create_team(db_session, team_data)
+    return await run_write(db_session, db_teams.create_team, team_data)
 
 
-@router.get('/{team_id}/', status_code=status.HTTP_200_OK)
-def get_team_by_id(team_id: int = Path(), db_session: Session = Depends(get_session)) -> Team:
+@router.post('/bulk', status_code=status.HTTP_201_CREATED, dependencies=[Depends(verify_token_dependency)],
+             openapi_extra=bulk_openapi('TeamBase'))
+async def create_teams_bulk(rows: list = Depends(read_bulk_rows), db_session: Session | AsyncSession = Depends(get_db_session)) -> BulkCreateResult:
+    """
+    Creates many teams in the database with batched inserts.
+    The body is a JSON array or NDJSON (one team per line); invalid rows are reported without stopping the others.
+    - **rows**:        Team objects to be added into the database.
+    """
+    valid, errors = validate_bulk_rows(rows, TeamBase)
+    ids, db_errors = await run_operation(db_session, db_teams.create_teams, [team for _, team in valid])
+    return bulk_result(valid, ids, db_errors, errors)
+
+
+@router.get('/export', status_code=status.HTTP_200_OK, response_class=StreamingResponse)
+def export_teams(format: Literal['ndjson', 'csv'] = Query(default='ndjson'),
+                 name: str = Query(default=None),
+                 country: str = Query(default=None),
+                 city: str = Query(default=None),
+                 stadium: str = Query(default=None),
+                 color: str = Query(default=None),
+                 coach: str = Query(default=None)) -> StreamingResponse:
+    """
+    Exports all teams availables or filtered by one parameter, streaming them as NDJSON or CSV.
+    - **format**:      Output format, ndjson or csv.
+    - **name**:        Team name to filter.
+    - **country**:     Team country to filter.
+    - **city**:        Team city to filter.
+    - **stadium**:     Team stadium to filter.
+    - **color**:       Team color to filter.
+    - **coach**:       Team coach to filter.
+    """
+    filters = {"name": name, "country": country, "city": city, "stadium": stadium, "color": color, "coach": coach}
+    return export_response(db_teams.iter_teams, filters, list(Team.model_fields), format, 'teams')
+
+
+def output_fields(fields: list[str] | None, include: str | None) -> list[str] | None:
+    """
+    Adds the included relations to the team fields requested by the client.
+    @param fields:  Team fields requested, or None.
+    @param include: Relation included in the response.
+    @return:        Fields written in the response, or None.
+    """
+    return [*fields, include] if fields and include else fields
+
+
+@router.get('/changes', status_code=status.HTTP_200_OK, dependencies=[Depends(etag_dependency('teams'))])
+async def get_team_changes(response: Response,
+                           db_session: Session | AsyncSession = Depends(get_read_db_session),
+                           since: str = Query(default=None),
+                           limit: int = Query(default=PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE)) -> list[TeamChange]:
+    """
+    Gets the teams created, updated or deleted (inactivated, is_active false) since a cursor, oldest change first.
+    The X-Next-Cursor header is always returned to ask for the following changes, and X-Has-More tells whether
+    they are already available.
+    - **since**:        Cursor returned by the previous call, or none to get all the teams.
+    - **limit**:        Maximum number of teams returned.
+    """
+    after = decode_cursor(since, ('change_seq', 'id')) if since else None
+    teams = await run_operation(db_session, db_teams.get_team_changes, limit + 1, after and (after['change_seq'], after['id']))
+    return paginate_changes(response, teams, limit, since)
+
+
+@router.get('/{team_id}/', status_code=status.HTTP_200_OK, dependencies=[Depends(etag_dependency('teams', include=('players',)))])
+async def get_team_by_id(response: Response,
+                         team_id: int = Path(),
+                         include: Literal['players'] = Query(default=None),
+                         fields: str = Query(default=None),
+                         db_session: Session | AsyncSession = Depends(get_read_db_session)) -> TeamWithPlayers | Team:
     """
     Gets a team by ID.
     - **team_id**:     Identifier of the team.
+    - **include**:     Use players to include the active players of the team.
+    - **fields**:      Comma separated team fields to return (the ID, and the players when included, are always returned).
     """
-    if team := db_teams.get_team_by_id(db_session, team_id):
-        return team
+    fields = output_fields(parse_fields(fields, Team), include)
+    operation = db_teams.get_team_with_players if include == 'players' else db_teams.get_team_by_id
+    if team := await run_operation(db_session, operation, team_id):
+        return fast_response(team, TeamWithPlayers if include == 'players' else Team, response, fields)
     raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Team not found")
 
 
-@router.get('/', status_code=status.HTTP_200_OK)
-def get_teams(db_session: Session = Depends(get_session),
-              name: str = Query(default=None),
-              country: str = Query(default=None),
-              city: str = Query(default=None),
-              stadium: str = Query(default=None),
-              color: str = Query(default=None),
-              coach: str = Query(default=None)) -> list[Team]:
+@router.get('/', status_code=status.HTTP_200_OK, dependencies=[Depends(etag_dependency('teams', include=('players',)))])
+async def get_teams(response: Response,
+                    db_session: Session | AsyncSession = Depends(get_read_db_session),
+                    name: str = Query(default=None),
+                    country: str = Query(default=None),
+                    city: str = Query(default=None),
+                    stadium: str = Query(default=None),
+                    color: str = Query(default=None),
+                    coach: str = Query(default=None),
+                    is_active: bool = Query(default=True),
+                    include: Literal['players'] = Query(default=None),
+                    sort: Literal['id', '-id', 'name', '-name'] = Query(default='id'),
+                    limit: int = Query(default=PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+                    cursor: str = Query(default=None),
+                    ids: str = Query(default=None),
+                    fields: str = Query(default=None)) -> list[TeamWithPlayers | Team]:
     """
-    Gets a list with all teams availables or filtered by one parameter.
+    Gets a page of teams availables or filtered by one or more parameters, ordered by ID or the sort field.
+    The cursor of the next page is returned in the X-Next-Cursor header, and only works with the same sort.
+    With ids, the teams of those IDs are returned in the requested order instead, and the IDs not found are
+    returned in the X-Missing-Ids header.
     - **name**:        Team name to filter.
     - **country**:     Team country to filter.
     - **city**:        Team city to filter.
     - **stadium**:     Team stadium to filter.
     - **color**:       Team color to filter.
     - **coach**:       Team coach to filter.
+    - **is_active**:   Use false to get the deleted (inactivated) teams instead.
+    - **include**:     Use players to include the active players of every team.
+    - **sort**:        Field to sort by (id or name), with a leading - for the descending order.
+    - **limit**:       Maximum number of teams in the page.
+    - **cursor**:      Cursor returned by the previous page.
+    - **ids**:         Comma separated team identifiers to get (the filters, sort and pagination are ignored).
+    - **fields**:      Comma separated team fields to return (the ID, and the players when included, are always
+                       returned), only those columns are read.
     """
-    filters = {"name": name, "country": country, "city": city, "stadium": stadium, "color": color, "coach": coach}
-    teams = db_teams.get_teams(db_session, filters)
+    model = TeamWithPlayers if include == 'players' else Team
+    requested = parse_fields(fields, Team)
+    columns, fields = fast_fields(Team, requested), output_fields(requested, include)
+    if ids is not None:
+        team_ids = parse_ids(ids)
+        teams = await run_operation(db_session, db_teams.get_teams_by_ids, team_ids, include == 'players', columns)
+        return fast_response(report_missing(response, team_ids, teams), model, response, fields)
+
+    filters = {"name": name, "country": country, "city": city, "stadium": stadium, "color": color, "coach": coach,
+               "is_active": is_active}
+    after_id, after_value = decode_sorted_cursor(cursor, sort, Team) if cursor else (None, None)
+    # The sort field is selected too, as the next cursor is built from it.
+    if columns and sort.removeprefix('-') not in columns:
+        columns = [*columns, sort.removeprefix('-')]
+    teams = await run_operation(db_session, db_teams.get_teams, filters, limit + 1, after_id, include == 'players',
+                                columns, sort, after_value)
     if teams or teams == []:
-        return teams
+        return fast_response(paginate(response, teams, limit, sort), model, response, fields)
     raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail='Failed request')
 
 
-@router.get('/{team_id}/players/', status_code=status.HTTP_200_OK)
-def get_players_by_team_id(team_id: int = Path(), db_session: Session = Depends(get_session)) -> list[Player]:
+@router.get('/{team_id}/players/', status_code=status.HTTP_200_OK, dependencies=[Depends(etag_dependency('teams', 'players'))])
+async def get_players_by_team_id(response: Response, team_id: int = Path(), db_session: Session | AsyncSession = Depends(get_read_db_session)) -> list[Player]:
     """
     Gets team's players by team ID.
     - **team_id**:     Identifier of the team.
     """
-    if team := db_teams.get_team_by_id(db_session, team_id):
-        return team.players
+    players = await run_operation(db_session, db_teams.get_players_by_team_id, team_id)
+    if players is not None:
+        return fast_response(players, Player, response)
+    raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Team not found")
+
+
+@router.get('/{team_id}/stats/', status_code=status.HTTP_200_OK, dependencies=[Depends(etag_dependency('teams', 'players'))])
+async def get_team_stats(team_id: int = Path(), db_session: Session | AsyncSession = Depends(get_read_db_session)) -> TeamStats:
+    """
+    Gets the statistics of the active players of a team: average height and distributions of ages, positions, nationalities and dorsals.
+    - **team_id**:     Identifier of the team.
+    """
+    if stats := await run_operation(db_session, db_stats.get_team_stats, team_id):
+        return stats
     raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Team not found")
 
 
 @router.patch('/{team_id}/', status_code=status.HTTP_200_OK, dependencies=[Depends(verify_token_dependency)])
-def update_team(team_id: int = Path(), team_updates: TeamUpdates = Body(), db_session: Session = Depends(get_session)) -> Team:
+async def update_team(team_id: int = Path(), team_updates: TeamUpdates = Body(), db_session: Session | AsyncSession = Depends(get_db_session)) -> Team:
     """
     Updates a team by id.
     - **team_id**:      Identifier of the team.
     - **team_updates**: Object with fields and data to update.
     """
-    if team := db_teams.update_team(db_session, team_id, team_updates):
+    if team := await run_write(db_session, db_teams.update_team, team_id, team_updates):
         return team
     raise HTTPException(status_code=404, detail="Team not found")
     
 
 @router.delete('/{team_id}/', status_code=status.HTTP_200_OK, dependencies=[Depends(verify_token_dependency)])
-def delete_team(team_id: int = Path(), db_session: Session = Depends(get_session)) -> Team:
+async def delete_team(team_id: int = Path(), db_session: Session | AsyncSession = Depends(get_db_session)) -> Team:
     """
     Deletes (inactivates) a team by ID.
     - **team_id**:     Identifier of the team.
     """
-    if team := db_teams.delete_team(db_session, team_id):
+    if team := await run_write(db_session, db_teams.delete_team, team_id):
         return team
     raise HTTPException(status_code=404, detail="Team not found")
@@ -0,0 +1,187 @@
+"""
+Benchmarks every function of the operations layer against synthetic databases of several sizes.
+Results are written as JSON, and compared against a previous run when a baseline is given: the command exits
+with an error when a case got slower than the allowed ratio, so it can gate a deployment.
+
+Usage: python -m benchmarks.bench_operations [--scales 1000,10000,100000] [--repeat 20] [--output results.json]
+                                             [--baseline previous.json] [--threshold 1.25]
+"""
+
+# Python imports.
+import argparse, inspect, json, os, platform, random, sqlite3, statistics, sys, tempfile, time
+from datetime import date, datetime
+from typing import Callable
+from sqlmodel import Session
+
+# Project imports.
+from app.database.cache import players_cache, teams_cache
+from app.database.operations import players as db_players, stats as db_stats, teams as db_teams
+from app.models import PlayerBase, PlayerBulkUpdates, PlayerUpdates, TeamBase, TeamUpdates
+from benchmarks.generate_dataset import dataset_engine, generate_dataset, random_player, random_team
+
+
+MODULES = {'players': db_players, 'teams': db_teams, 'stats': db_stats}
+PLAYERS_PER_TEAM = 25
+
+
+def build_cases(rng: random.Random, players: int, teams: int) -> list[tuple[str, str, str, Callable, Callable]]:
+    """
+    Lists the benchmark cases of a database size.
+    @param rng:     Random generator used to pick IDs and payloads.
+    @param players: Number of players in the database.
+    @param teams:   Number of teams in the database.
+    @return:        Tuples of (module, function, case, setup, run), setup runs untimed before every run.
+    """
+    player_id = lambda: rng.randint(1, players)
+    team_id = lambda: rng.randint(1, teams)
+    new_player = lambda: PlayerBase(**random_player(rng, teams))
+    new_team = lambda: TeamBase(**random_team(rng))
+    nothing = lambda: None
+    clear_caches = lambda: (players_cache.clear(), teams_cache.clear())
+    last_page = lambda limit: max(0, players - limit)
+
+    return [
+        ('players', 'create_player', 'single', nothing, lambda db: db_players.create_player(db, new_player())),
+        ('players', 'create_players', '1000 rows', nothing, lambda db: db_players.create_players(db, [new_player() for _ in range(1000)])),
+        ('players', 'get_player_db', 'random id', nothing, lambda db: db_players.get_player_db(db, player_id())),
+        ('players', 'get_player_by_id', 'cold cache', clear_caches, lambda db: db_players.get_player_by_id(db, player_id())),
+        ('players', 'get_player_by_id', 'warm cache', nothing, lambda db: db_players.get_player_by_id(db, 1)),
+        ('players', 'get_players', 'first page', nothing, lambda db: db_players.get_players(db, {}, limit=100)),
+        ('players', 'get_players', 'last page', nothing, lambda db: db_players.get_players(db, {}, limit=100, after_id=last_page(100))),
+        ('players', 'get_players', 'search', nothing, lambda db: db_players.get_players(db, {'lastname': 'mar'}, limit=100)),
+        ('players', 'get_players', 'fields', nothing, lambda db: db_players.get_players(db, {}, limit=1000, fields=['id', 'lastname'])),
+        ('players', 'get_players', 'range sorted', nothing, lambda db: db_players.get_players(
+            db, {'birthdate_min': date(2000, 1, 1), 'height_min': 1.85}, limit=100, sort='-height')),
+        ('players', 'get_players', 'team sorted', nothing, lambda db: db_players.get_players(db, {'team_id': team_id()}, limit=100, sort='dorsal')),
+        ('players', 'get_players_by_ids', '100 ids', nothing, lambda db: db_players.get_players_by_ids(db, list({player_id() for _ in range(100)}))),
+        ('players', 'get_player_changes', 'recent', nothing, lambda db: db_players.get_player_changes(db, 100, (players - 100, 0))),
+        ('players', 'iter_players', 'full scan', nothing, lambda db: sum(1 for _ in db_players.iter_players(db, {}))),
+        ('players', 'update_player', 'random id', nothing, lambda db: db_players.update_player(db, player_id(), PlayerUpdates(dorsal=rng.randint(1, 99)))),
+        ('players', 'update_players', '100 transfers', nothing, lambda db: db_players.update_players(
+            db, [PlayerBulkUpdates(id=player_id(), team_id=rng.randint(1, min(teams, 4))) for _ in range(100)])),
+        ('players', 'delete_player', 'random id', nothing, lambda db: db_players.delete_player(db, player_id())),
+        ('teams', 'create_team', 'single', nothing, lambda db: db_teams.create_team(db, new_team())),
+        ('teams', 'create_teams', '100 rows', nothing, lambda db: db_teams.create_teams(db, [new_team() for _ in range(100)])),
+        ('teams', 'get_team_db', 'random id', nothing, lambda db: db_teams.get_team_db(db, team_id())),
+        ('teams', 'get_team_by_id', 'cold cache', clear_caches, lambda db: db_teams.get_team_by_id(db, team_id())),
+        ('teams', 'get_team_by_id', 'warm cache', nothing, lambda db: db_teams.get_team_by_id(db, 1)),
+        ('teams', 'get_team_with_players', 'random id', nothing, lambda db: db_teams.get_team_with_players(db, team_id())),
+        ('teams', 'get_teams', 'first page', nothing, lambda db: db_teams.get_teams(db, {}, limit=100)),
+        ('teams', 'get_teams', 'search', nothing, lambda db: db_teams.get_teams(db, {'city': 'mar'}, limit=100)),
+        ('teams', 'get_teams', 'sorted', nothing, lambda db: db_teams.get_teams(db, {}, limit=100, sort='name')),
+        ('teams', 'get_teams', 'include players', nothing, lambda db: db_teams.get_teams(db, {}, limit=10, include_players=True)),
+        ('teams', 'get_teams_by_ids', '10 ids', nothing, lambda db: db_teams.get_teams_by_ids(db, list({team_id() for _ in range(10)}))),
+        ('teams', 'get_team_changes', 'recent', nothing, lambda db: db_teams.get_team_changes(db, 100, (teams - 100, 0))),
+        ('teams', 'iter_teams', 'full scan', nothing, lambda db: sum(1 for _ in db_teams.iter_teams(db, {}))),
+        ('teams', 'get_players_by_team_id', 'random id', clear_caches, lambda db: db_teams.get_players_by_team_id(db, team_id())),
+        ('teams', 'update_team', 'random id', nothing, lambda db: db_teams.update_team(db, team_id(), TeamUpdates(color=rng.choice(['Red', 'Blue'])))),
+        ('teams', 'delete_team', 'random id', nothing, lambda db: db_teams.delete_team(db, team_id())),
+        ('stats', 'get_team_stats', 'random id', nothing, lambda db: db_stats.get_team_stats(db, team_id())),
+        ('stats', 'get_league_stats', 'all teams', nothing, lambda db: db_stats.get_league_stats(db)),
+        ('stats', 'rebuild_stats', 'all teams', nothing, lambda db: db_stats.rebuild_stats(db)),
+    ]
+
+
+def uncovered_functions(cases: list[tuple]) -> list[str]:
+    """
+    Lists the operations that receive a database session and have no benchmark case, so new ones are not missed.
+    @param cases:   Benchmark cases.
+    @return:        Names of the uncovered functions, as module.function.
+    """
+    covered = {(module, function) for module, function, *_ in cases}
+    return [f'{name}.{function}' for name, module in MODULES.items()
+            for function, member in inspect.getmembers(module, inspect.isfunction)
+            if member.__module__ == module.__name__ and next(iter(inspect.signature(member).parameters), None) == 'db'
+            and (name, function) not in covered]
+
+
+def run_case(db: Session, setup: Callable, run: Callable, repeat: int) -> dict:
+    """
+    Times a benchmark case after a warm up run.
+    @param db:      Database session.
+    @param setup:   Function called before every run, not timed.
+    @param run:     Function timed, receives the session.
+    @param repeat:  Number of timed runs.
+    @return:        Timings in milliseconds.
+    """
+    setup(); run(db)
+    timings = []
+    for _ in range(repeat):
+        setup()
+        start = time.perf_counter()
+        run(db)
+        timings.append((time.perf_counter() - start) * 1000)
+    timings.sort()
+    return {'runs': repeat, 'mean_ms': round(statistics.fmean(timings), 4), 'median_ms': round(statistics.median(timings), 4),
+            'p95_ms': round(timings[min(len(timings) - 1, int(len(timings) * 0.95))], 4), 'min_ms': round(timings[0], 4)}
+
+
+def compare(results: list[dict], baseline: list[dict], threshold: float) -> list[str]:
+    """
+    Finds the cases whose median time grew more than the threshold ratio against a baseline.
+    @param results:     Results of the current run.
+    @param baseline:    Results of a previous run.
+    @param threshold:   Maximum allowed ratio between the current and the baseline median.
+    @return:            Description of every regression.
+    """
+    key = lambda result: (result['scale'], result['module'], result['function'], result['case'])
+    previous = {key(result): result for result in baseline}
+    regressions = []
+    for result in results:
+        before = previous.get(key(result))
+        if before and result['median_ms'] > before['median_ms'] * threshold:
+            regressions.append(f"{result['module']}.{result['function']} ({result['case']}, {result['scale']} players): "
+                               f"{before['median_ms']:.3f}ms -> {result['median_ms']:.3f}ms")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--scales', default='1000,10000,100000', help='Comma separated numbers of players.')
+    parser.add_argument('--repeat', type=int, default=20, help='Timed runs of every case.')
+    parser.add_argument('--seed', type=int, default=0, help='Seed of the datasets and the cases.')
+    parser.add_argument('--output', default='bench_operations.json', help='Path of the JSON results.')
+    parser.add_argument('--baseline', help='JSON results of a previous run to compare against.')
+    parser.add_argument('--threshold', type=float, default=1.25, help='Allowed slowdown ratio against the baseline.')
+    args = parser.parse_args()
+
+    results = []
+    directory = tempfile.mkdtemp()
+    for scale in map(int, args.scales.split(',')):
+        teams = max(1, scale // PLAYERS_PER_TEAM)
+        db_engine = dataset_engine(os.path.join(directory, f'bench_{scale}.db'))
+        generate_dataset(db_engine, teams, scale, args.seed)
+        # Caches are keyed by ID only, entries of the previous database must not leak into this one.
+        players_cache.clear(); teams_cache.clear()
+
+        rng = random.Random(args.seed)
+        cases = build_cases(rng, scale, teams)
+        print(f'{scale} players, {teams} teams')
+        with Session(db_engine) as session:
+            for module, function, case, setup, run in cases:
+                result = {'scale': scale, 'module': module, 'function': function, 'case': case,
+                          **run_case(session, setup, run, args.repeat)}
+                results.append(result)
+                print(f"  {module + '.' + function:<32} {case:<16} {result['median_ms']:>10.3f}ms {result['p95_ms']:>10.3f}ms")
+        db_engine.dispose()
+
+    for name in uncovered_functions(cases):
+        print(f'Warning: {name} has no benchmark case', file=sys.stderr)
+
+    with open(args.output, 'w') as file:
+        json.dump({'created_at': datetime.now().isoformat(), 'python': platform.python_version(),
+                   'sqlite': sqlite3.sqlite_version, 'seed': args.seed, 'repeat': args.repeat,
+                   'results': results}, file, indent=2)
+    print(f'Results written to {args.output}')
+
+    if args.baseline:
+        with open(args.baseline) as file:
+            regressions = compare(results, json.load(file)['results'], args.threshold)
+        for regression in regressions:
+            print(f'Regression: {regression}', file=sys.stderr)
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
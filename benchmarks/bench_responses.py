@@ -0,0 +1,49 @@
+"""
+Benchmarks the fast JSON response path (FAST_RESPONSES) against the default one, in requests per second.
+It runs against a throwaway database filled with synthetic players.
+
+Usage: python -m benchmarks.bench_responses [--players 5000] [--limit 1000] [--seconds 5]
+"""
+
+# Python imports.
+import argparse, os, tempfile, time
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--players', type=int, default=5000, help='Number of players in the database.')
+    parser.add_argument('--limit', type=int, default=1000, help='Page size of the list requests.')
+    parser.add_argument('--seconds', type=float, default=5, help='Duration of every measure.')
+    args = parser.parse_args()
+
+    # The database path must be set before the application is imported.
+    os.environ['DATABASE_PATH'] = os.path.join(tempfile.mkdtemp(), 'bench.db')
+
+    from fastapi.testclient import TestClient
+    from app import responses
+    from app.main import app
+    from app.database.database import engine
+    from benchmarks.generate_dataset import generate_dataset
+
+    generate_dataset(engine, teams=max(1, args.players // 25), players=args.players)
+
+    client = TestClient(app)
+    urls = {'list': f'/players/?limit={args.limit}', 'detail': '/players/1/'}
+
+    print(f"{'route':<8} {'mode':<8} {'req/s':>10}")
+    results = {}
+    for name, url in urls.items():
+        for fast in (False, True):
+            responses.FAST_RESPONSES = fast
+            client.get(url)
+            count, start = 0, time.perf_counter()
+            while time.perf_counter() - start < args.seconds:
+                client.get(url)
+                count += 1
+            results[name, fast] = count / (time.perf_counter() - start)
+            print(f"{name:<8} {'fast' if fast else 'default':<8} {results[name, fast]:>10.1f}")
+        print(f"{name:<8} {'speedup':<8} {results[name, True] / results[name, False]:>9.2f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,100 @@
+"""
+Generates a synthetic, reproducible dataset of teams and players in a throwaway SQLite database.
+
+Usage: python -m benchmarks.generate_dataset OUTPUT [--teams 100] [--players 100000] [--seed 0]
+"""
+
+# Python imports.
+import argparse, random, time
+from datetime import date, timedelta
+from sqlalchemy import Engine, create_engine, event, insert
+
+# Project imports.
+from app.database.database import connect_args, create_db_and_tables, set_sqlite_pragmas
+from app.models import PlayerDB, TeamDB
+
+
+SYLLABLES = ['al', 'ber', 'car', 'da', 'el', 'fer', 'gon', 'hu', 'is', 'ja', 'ka', 'lo', 'mar', 'ne', 'or', 'pe',
+             'ra', 'san', 'to', 'va', 'xi', 'zu']
+COUNTRIES = ['Argentina', 'Brazil', 'Colombia', 'England', 'France', 'Germany', 'Italy', 'Mexico', 'Portugal',
+             'Spain', 'Uruguay', 'Netherlands']
+POSITIONS = ['Goalkeeper', 'Defender', 'Midfield', 'Forward']
+COLORS = ['Red', 'Blue', 'White', 'Black', 'Green', 'Yellow', 'Red/White', 'Blue/White']
+
+
+def dataset_engine(path: str) -> Engine:
+    """
+    Creates an engine for a database file, with the same pragmas as the application.
+    @param path:    Path of the SQLite database file.
+    @return:        Engine.
+    """
+    db_engine = create_engine(f'sqlite:///{path}', connect_args=connect_args)
+    event.listen(db_engine, 'connect', set_sqlite_pragmas)
+    return db_engine
+
+
+def random_name(rng: random.Random, syllables: int, max_length: int) -> str:
+    return ''.join(rng.choice(SYLLABLES) for _ in range(syllables)).capitalize()[:max_length]
+
+
+def random_team(rng: random.Random) -> dict:
+    """
+    Builds the column values of a random team.
+    @param rng: Random generator.
+    @return:    Dictionary with the values of a team.
+    """
+    country = rng.choice(COUNTRIES)
+    city = random_name(rng, 3, 20)
+    return {'name': f'{city} {rng.choice(["FC", "United", "City", "Athletic"])}'[:30], 'country': country,
+            'city': city, 'stadium': f'Estadio {random_name(rng, 3, 22)}', 'color': rng.choice(COLORS),
+            'coach': f'{random_name(rng, 2, 14)} {random_name(rng, 3, 15)}', 'is_active': True}
+
+
+def random_player(rng: random.Random, teams: int) -> dict:
+    """
+    Builds the column values of a random player.
+    @param rng:     Random generator.
+    @param teams:   Number of teams, players get a team ID between 1 and this value.
+    @return:        Dictionary with the values of a player.
+    """
+    return {'firstname': random_name(rng, 2, 30), 'lastname': random_name(rng, 3, 30).ljust(5, 'a'),
+            'birthdate': date(1985, 1, 1) + timedelta(days=rng.randint(0, 365 * 22)),
+            'height': round(rng.uniform(1.60, 2.05), 2), 'nationality': rng.choice(COUNTRIES),
+            'position': rng.choice(POSITIONS), 'dorsal': rng.randint(1, 99), 'team_id': rng.randint(1, teams),
+            'is_active': True}
+
+
+def generate_dataset(db_engine: Engine, teams: int, players: int, seed: int = 0, chunk_size: int = 10000) -> None:
+    """
+    Creates the tables and fills them with random teams and players, always the same for the same seed.
+    Rows are inserted with executemany in chunks, one transaction each, so millions of rows fit in memory.
+    @param db_engine:   Engine of an empty database.
+    @param teams:       Number of teams.
+    @param players:     Number of players.
+    @param seed:        Seed of the random generator.
+    @param chunk_size:  Number of rows per transaction.
+    """
+    rng = random.Random(seed)
+    create_db_and_tables(db_engine)
+
+    for model, count, build in ((TeamDB, teams, lambda: random_team(rng)), (PlayerDB, players, lambda: random_player(rng, teams))):
+        for start in range(0, count, chunk_size):
+            with db_engine.begin() as connection:
+                connection.execute(insert(model), [build() for _ in range(min(chunk_size, count - start))])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('output', help='Path of the database file to create.')
+    parser.add_argument('--teams', type=int, default=100, help='Number of teams.')
+    parser.add_argument('--players', type=int, default=100000, help='Number of players.')
+    parser.add_argument('--seed', type=int, default=0, help='Seed of the random generator.')
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    generate_dataset(dataset_engine(args.output), args.teams, args.players, args.seed)
+    print(f'{args.teams} teams and {args.players} players written to {args.output} in {time.perf_counter() - start:.1f}s')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,167 @@
+"""
+Drives the API with concurrent clients running a weighted mix of scenarios, and reports the throughput and the
+p50/p95/p99 latencies of every route.
+Without --url the application runs in-process (ASGI transport) against a throwaway synthetic database; with --url
+it targets a running server (e.g. uvicorn app.main:app --workers 4), whose database must hold teams and players.
+
+Usage: python -m benchmarks.load_test [--url http://127.0.0.1:8000] [--concurrency 20] [--seconds 10]
+                                      [--weights get_player=40,list_players=20,...] [--output results.json]
+"""
+
+# Python imports.
+import argparse, asyncio, json, os, random, sys, tempfile, time
+from collections import defaultdict
+from dotenv import load_dotenv
+import httpx
+
+
+WEIGHTS = {'login': 5, 'get_player': 35, 'get_team': 10, 'list_players': 15, 'list_teams': 5, 'create_player': 15,
+           'patch_player': 15}
+POSITIONS = ['Goalkeeper', 'Defender', 'Midfield', 'Forward']
+
+
+def scenarios(players: int, teams: int, credentials: dict) -> dict:
+    """
+    Builds the scenarios, every one a coroutine function that makes a request with a client and a token.
+    @param players:     Number of players in the database, IDs are picked between 1 and this value.
+    @param teams:       Number of teams in the database.
+    @param credentials: Username and password used to log in.
+    @return:            Scenarios by name.
+    """
+    player = lambda: {'firstname': 'Load', 'lastname': 'Tester', 'birthdate': '1995-05-05', 'height': 1.8,
+                      'nationality': 'Colombia', 'position': random.choice(POSITIONS), 'dorsal': random.randint(1, 99),
+                      'team_id': random.randint(1, teams)}
+    return {
+        'login': lambda client, token: client.post('/auth/login', json=credentials),
+        'get_player': lambda client, token: client.get(f'/players/{random.randint(1, players)}/'),
+        'get_team': lambda client, token: client.get(f'/teams/{random.randint(1, teams)}/'),
+        'list_players': lambda client, token: client.get('/players/', params={'position': random.choice(POSITIONS), 'limit': 50}),
+        'list_teams': lambda client, token: client.get('/teams/', params={'limit': 50}),
+        'create_player': lambda client, token: client.post('/players/', json=player(), headers={'Authorization': token}),
+        'patch_player': lambda client, token: client.patch(f'/players/{random.randint(1, players)}/',
+                                                           json={'dorsal': random.randint(1, 99)}, headers={'Authorization': token}),
+    }
+
+
+async def worker(client: httpx.AsyncClient, token: str, names: list[str], weights: list[int], actions: dict,
+                 deadline: float, latencies: dict, errors: dict) -> None:
+    """
+    Runs random scenarios, picked by weight, until the deadline.
+    @param client:      HTTP client.
+    @param token:       Authorization header value for the write scenarios.
+    @param names:       Scenario names.
+    @param weights:     Weight of every scenario.
+    @param actions:     Scenarios by name.
+    @param deadline:    perf_counter value when the worker stops.
+    @param latencies:   Latencies in seconds by scenario, filled by the worker.
+    @param errors:      Count of failed requests by scenario, filled by the worker.
+    """
+    while time.perf_counter() < deadline:
+        name = random.choices(names, weights)[0]
+        start = time.perf_counter()
+        try:
+            response = await actions[name](client, token)
+            failed = response.status_code >= 400
+        except httpx.HTTPError:
+            failed = True
+        latencies[name].append(time.perf_counter() - start)
+        errors[name] += failed
+
+
+def percentile(values: list[float], ratio: float) -> float:
+    return values[min(len(values) - 1, int(len(values) * ratio))]
+
+
+def report(latencies: dict, errors: dict, elapsed: float) -> dict:
+    """
+    Summarizes the latencies of every scenario and prints them as a table.
+    @param latencies:   Latencies in seconds by scenario.
+    @param errors:      Count of failed requests by scenario.
+    @param elapsed:     Duration of the test in seconds.
+    @return:            Summary by scenario, plus the total.
+    """
+    summary = {}
+    for name, values in sorted(latencies.items()) + [('total', [value for values in latencies.values() for value in values])]:
+        values = sorted(values)
+        if values:
+            summary[name] = {'requests': len(values), 'errors': errors[name] if name != 'total' else sum(errors.values()),
+                             'rps': round(len(values) / elapsed, 1),
+                             **{f'p{int(ratio * 100)}_ms': round(percentile(values, ratio) * 1000, 2) for ratio in (0.5, 0.95, 0.99)}}
+
+    print(f"{'route':<14} {'requests':>9} {'errors':>7} {'req/s':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+    for name, row in summary.items():
+        print(f"{name:<14} {row['requests']:>9} {row['errors']:>7} {row['rps']:>9.1f} {row['p50_ms']:>9.2f} "
+              f"{row['p95_ms']:>9.2f} {row['p99_ms']:>9.2f}")
+    return summary
+
+
+async def run(args: argparse.Namespace, transport: httpx.AsyncBaseTransport | None, players: int, teams: int) -> dict:
+    weights = {**WEIGHTS, **{name: int(weight) for name, weight in (item.split('=') for item in args.weights.split(',') if item)}}
+    unknown = set(weights) - set(WEIGHTS)
+    if unknown:
+        raise SystemExit(f"Unknown scenarios: {', '.join(sorted(unknown))}")
+
+    credentials = {'username': args.username, 'password': args.password}
+    actions = scenarios(players, teams, credentials)
+    limits = httpx.Limits(max_connections=args.concurrency)
+    async with httpx.AsyncClient(base_url=args.url or 'http://loadtest', transport=transport, limits=limits,
+                                 timeout=args.timeout) as client:
+        response = await client.post('/auth/login', json=credentials)
+        response.raise_for_status()
+        token = response.json()['token']
+
+        latencies, errors = defaultdict(list), defaultdict(int)
+        start = time.perf_counter()
+        await asyncio.gather(*(worker(client, token, list(weights), list(weights.values()), actions,
+                                      start + args.seconds, latencies, errors) for _ in range(args.concurrency)))
+        return report(latencies, errors, time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--url', help='Base URL of a running server, the application runs in-process when missing.')
+    parser.add_argument('--concurrency', type=int, default=20, help='Number of concurrent clients.')
+    parser.add_argument('--seconds', type=float, default=10, help='Duration of the test.')
+    parser.add_argument('--weights', default='', help='Comma separated scenario=weight pairs overriding the defaults.')
+    parser.add_argument('--players', type=int, default=10000, help='Players in the database (generated in-process).')
+    parser.add_argument('--teams', type=int, default=400, help='Teams in the database (generated in-process).')
+    parser.add_argument('--username', help='Username used to log in, USER of the environment by default.')
+    parser.add_argument('--password', help='Password used to log in, PASSWORD of the environment by default.')
+    parser.add_argument('--timeout', type=float, default=30, help='Timeout of every request in seconds.')
+    parser.add_argument('--seed', type=int, default=0, help='Seed of the dataset and the scenario picks.')
+    parser.add_argument('--output', help='Path of the JSON results.')
+    args = parser.parse_args()
+
+    random.seed(args.seed)
+    database_path = None
+    if not args.url:
+        # The settings read the database path when imported, so it is set before importing them or the application.
+        database_path = os.path.join(tempfile.mkdtemp(), 'load_test.db')
+        os.environ['DATABASE_PATH'] = database_path
+
+    from settings import DEBUG
+    load_dotenv('.env' if not DEBUG else '.env.dev')
+    args.username = args.username or os.getenv('USER')
+    args.password = args.password or os.getenv('PASSWORD')
+
+    transport = None
+    if not args.url:
+        from app.main import app
+        from app.database.database import engine
+        from benchmarks.generate_dataset import generate_dataset
+
+        # Never writes the synthetic data and scenarios into another database (e.g. the development one).
+        if engine.url.database != database_path:
+            sys.exit(f'The application database is {engine.url.database}, expected {database_path}')
+        generate_dataset(engine, args.teams, args.players, args.seed)
+        transport = httpx.ASGITransport(app=app)
+
+    summary = asyncio.run(run(args, transport, args.players, args.teams))
+    if args.output:
+        with open(args.output, 'w') as file:
+            json.dump({'url': args.url, 'concurrency': args.concurrency, 'seconds': args.seconds, 'routes': summary},
+                      file, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -2,4 +2,77 @@
 Settings for the FastAPI application.
 """
 
+# Python imports.
+import os
+
+
 DEBUG = True
+
+# Pagination of the list endpoints.
+PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+
+# Maximum number of IDs per IN query of the lookups by IDs (SQLite limits the parameters of a statement).
+IDS_CHUNK_SIZE = 900
+
+# Number of rows inserted per transaction by the bulk endpoints.
+BULK_CHUNK_SIZE = 500
+
+# Number of rows fetched from the database cursor per batch by the export endpoints.
+EXPORT_BATCH_SIZE = 1000
+
+# Database engine profile: the writes share a single connection (SQLite has a single writer), while the GET
+# routes read through their own pool of read-only connections, so they never queue behind the writes.
+DATABASE_PATH = os.getenv('DATABASE_PATH', 'database.db')
+DATABASE_URL = f'sqlite:///{DATABASE_PATH}'
+DATABASE_READ_URL = f'sqlite:///file:{DATABASE_PATH}?mode=ro&uri=true'
+DATABASE_READ_POOL_SIZE = 10
+DATABASE_READ_MAX_OVERFLOW = 10
+DATABASE_POOL_TIMEOUT = 30
+
+# Async request path: sessions on aiosqlite engines instead of the threadpool (requires aiosqlite).
+ASYNC_DATABASE = False
+ASYNC_DATABASE_URL = f'sqlite+aiosqlite:///{DATABASE_PATH}'
+ASYNC_DATABASE_READ_URL = f'sqlite+aiosqlite:///file:{DATABASE_PATH}?mode=ro&uri=true'
+
+# Group commit: the single row creates, updates and deletes of the routers are queued to a background writer,
+# which commits them together after GROUP_COMMIT_WINDOW seconds or GROUP_COMMIT_MAX_BATCH operations.
+GROUP_COMMIT = False
+GROUP_COMMIT_WINDOW = 0.002
+GROUP_COMMIT_MAX_BATCH = 100
+
+# PRAGMA statements applied to every new SQLite connection.
+SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',          # Readers do not block writers and vice versa.
+    'synchronous': 'NORMAL',        # Safe with WAL, fsync only on checkpoints.
+    'busy_timeout': 5000,           # Milliseconds waiting for the write lock before failing.
+    'mmap_size': 268435456,         # 256 MB of the database file read through memory mapping.
+    'cache_size': -65536,           # 64 MB of page cache per connection (negative values are KiB).
+}
+
+# Read-through cache of players and teams by ID (0 entries disables it).
+ENTITY_CACHE_SIZE = 10000
+ENTITY_CACHE_TTL = 60
+
+# Authentication tokens.
+TOKEN_EXPIRE_MINUTES = 60
+TOKEN_CACHE_SIZE = 1024
+
+# Serialize the list and detail responses with orjson, skipping the validation against the response model.
+FAST_RESPONSES = False
+
+# Request metrics exposed on /metrics (Prometheus text format).
+METRICS_ENABLED = True
+METRICS_LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+METRICS_SIZE_BUCKETS = (100, 1000, 10000, 100000, 1000000, 10000000)
+
+# Query profiling: statements slower than the threshold (seconds) are logged with their EXPLAIN QUERY PLAN.
+# In DEBUG mode the responses include the X-Query-Count and X-DB-Time (milliseconds) headers.
+QUERY_PROFILING = False
+SLOW_QUERY_THRESHOLD = 0.1
+
+# Server-Sent Events of the changes: events kept to resume streams, events queued per client before dropping it,
+# and seconds between keepalive comments.
+EVENTS_BUFFER_SIZE = 1000
+EVENTS_QUEUE_SIZE = 256
+EVENTS_KEEPALIVE = 15
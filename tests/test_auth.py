@@ -0,0 +1,45 @@
+"""
+Implements unit tests to auth router.
+"""
+
+# Python imports.
+import os, time, jwt
+from dotenv import load_dotenv
+from fastapi.testclient import TestClient
+
+# Project imports.
+from app.main import app
+from app.routers.auth import SECRET_KEY, verified_tokens
+
+
+load_dotenv('.env')
+
+
+client = TestClient(app)
+
+
+def test_login():
+    response = client.post('/auth/login', json={"username": os.getenv('USER'), "password": os.getenv('PASSWORD')})
+    assert response.status_code == 200
+    assert response.json()['token'].startswith('Bearer ')
+
+
+def test_bad_login():
+    response = client.post('/auth/login', json={"username": os.getenv('USER'), "password": "wrong password"})
+    assert response.status_code == 401
+    assert response.json() == {"detail": "Invalid data!"}
+
+
+def test_verified_token_cached():
+    token = client.post('/auth/login', json={"username": os.getenv('USER'), "password": os.getenv('PASSWORD')}).json()['token']
+    response = client.post('/teams/', json={}, headers={"Authorization": token})
+    assert response.status_code == 422
+    assert token.split(' ')[-1] in verified_tokens
+
+
+def test_expired_token():
+    payload = {"username": os.getenv('USER'), "password": os.getenv('PASSWORD'), "exp": int(time.time()) - 10}
+    token = jwt.encode(payload, SECRET_KEY, algorithm='HS256')
+    response = client.post('/teams/', json={}, headers={"Authorization": f"Bearer {token}"})
+    assert response.status_code == 401
+    assert token not in verified_tokens
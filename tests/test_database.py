@@ -0,0 +1,53 @@
+"""
+Implements unit tests to the read and write engines.
+"""
+
+# Python imports.
+import os, pytest
+from dotenv import load_dotenv
+from fastapi.testclient import TestClient
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+from sqlmodel import Session
+
+# Project imports.
+from app.main import app
+from app.database.database import engine, read_engine
+from app.models import TeamDB
+
+
+load_dotenv('.env')
+
+
+client = TestClient(app)
+
+
+def get_token():
+    response = client.post('/auth/login', json={"username": os.getenv('USER'), "password": os.getenv('PASSWORD')})
+    return response.json()['token']
+
+
+def delete_created_db_record(model, id):
+    with Session(engine) as session:
+        session.delete(session.get(model, id))
+        session.commit()
+
+
+def test_read_engine_is_read_only():
+    with Session(read_engine) as session:
+        assert session.execute(text('SELECT COUNT(*) FROM players')).scalar() >= 0
+        with pytest.raises(OperationalError, match='readonly'):
+            session.execute(text("UPDATE players SET firstname = 'Read only' WHERE id = 1"))
+
+
+def test_reads_do_not_wait_for_writes():
+    team = {"name": "Name", "country": "Country", "city": "City", "stadium": "Stadium", "color": "Color", "coach": "Coach"}
+    team_id = client.post('/teams/', json=team, headers={"Authorization": get_token()}).json()['id']
+    with Session(engine) as session:
+        # Holds the only write connection in an uncommitted write transaction.
+        session.execute(text(f"UPDATE teams SET name = 'Uncommitted' WHERE id = {team_id}"))
+        response = client.get('/teams/', params={'ids': team_id})
+        assert response.status_code == 200
+        assert response.json()[0]['name'] == team['name']
+        session.rollback()
+    delete_created_db_record(TeamDB, team_id)
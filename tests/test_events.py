@@ -0,0 +1,150 @@
+"""
+Implements unit tests to the Server-Sent Events of the changes.
+"""
+
+# Python imports.
+import asyncio, json, os, threading
+from fastapi.testclient import TestClient
+
+# Project imports.
+from dotenv import load_dotenv
+from app.main import app
+from app.database.events import EventBroker, events
+from app.routers.events import event_stream, stream_events
+
+
+load_dotenv('.env')
+
+
+client = TestClient(app)
+
+
+def get_token():
+    response = client.post('/auth/login', json={"username": os.getenv('USER'), "password": os.getenv('PASSWORD')})
+    return response.json()['token']
+
+
+def parse(message: bytes) -> dict:
+    return dict(line.split(': ', 1) for line in message.decode().strip().splitlines())
+
+
+def test_publish_from_thread():
+    broker = EventBroker(buffer_size=10, queue_size=10)
+
+    async def receive():
+        subscriber, missed = broker.subscribe(entities={'players'})
+        assert missed == []
+        for entity in ('teams', 'players'):
+            thread = threading.Thread(target=broker.publish, args=(entity, 'updated', {'id': 1}))
+            thread.start(); thread.join()
+        return await asyncio.wait_for(subscriber.queue.get(), 1), subscriber.queue.qsize()
+
+    event, queued = asyncio.run(receive())
+    assert queued == 0
+    assert parse(event.message) == {'id': f'{broker.epoch}-2', 'event': 'players.updated', 'data': '{"id":1}'}
+
+
+def test_resume():
+    broker = EventBroker(buffer_size=3, queue_size=10)
+    for player_id in range(1, 6):
+        broker.publish('players', 'deleted', {'id': player_id})
+
+    async def resume(last_event_id):
+        subscriber, missed = broker.subscribe(last_event_id)
+        broker.unsubscribe(subscriber)
+        return missed if missed is None else [event.id for event in missed]
+
+    assert asyncio.run(resume(f'{broker.epoch}-3')) == [4, 5]
+    assert asyncio.run(resume(f'{broker.epoch}-5')) == []
+    assert asyncio.run(resume(f'{broker.epoch}-1')) is None
+    assert asyncio.run(resume('other-4')) is None
+    assert asyncio.run(resume('invalid')) is None
+
+
+def test_slow_subscriber_dropped():
+    broker = EventBroker(buffer_size=10, queue_size=2)
+    broker.publish('players', 'created', {'id': 0})
+
+    async def overflow():
+        subscriber, _ = broker.subscribe()
+        for player_id in range(1, 4):
+            broker.publish('players', 'created', {'id': player_id})
+        await asyncio.sleep(0)
+        received = [await subscriber.queue.get()]
+        resumed, missed = broker.subscribe(f'{broker.epoch}-1')
+        broker.unsubscribe(resumed)
+        return subscriber, received, missed
+
+    subscriber, received, missed = asyncio.run(overflow())
+    assert subscriber.dropped and subscriber not in broker.subscribers
+    # No event is delivered after the last one received, so reconnecting replays all the dropped ones.
+    assert received == [None]
+    assert [event.id for event in missed] == [2, 3, 4]
+
+
+def test_stream_reset():
+    async def first_messages():
+        stream = event_stream('invalid', None)
+        messages = [await anext(stream), await anext(stream)]
+        subscribed = len(events.subscribers)
+        await stream.aclose()
+        return subscribed, messages
+
+    subscribed, messages = asyncio.run(first_messages())
+    assert messages[0].startswith(b'retry: ')
+    assert messages[1] == b'event: reset\ndata: {}\n\n'
+    assert subscribed == 1 and not events.subscribers
+
+
+def test_stream_not_started():
+    async def disconnect_before_streaming():
+        response = await stream_events(entity=None, last_event_id=None)
+        # The client is gone before the body is iterated, so the stream is only closed.
+        await response.body_iterator.aclose()
+
+    asyncio.run(disconnect_before_streaming())
+    assert not events.subscribers
+
+
+def test_team_events():
+    token = get_token()
+    team = {"name": "Name", "country": "Country", "city": "City", "stadium": "Stadium", "color": "Color", "coach": "Coach"}
+
+    async def receive():
+        subscriber, _ = events.subscribe(entities={'teams'})
+        try:
+            response = await asyncio.to_thread(client.post, '/teams/', json=team, headers={"Authorization": token})
+            team_id = response.json()['id']
+            await asyncio.to_thread(client.delete, f'/teams/{team_id}/', headers={"Authorization": token})
+            return team_id, [parse((await asyncio.wait_for(subscriber.queue.get(), 1)).message) for _ in range(2)]
+        finally:
+            events.unsubscribe(subscriber)
+
+    team_id, (created, deleted) = asyncio.run(receive())
+    assert created['event'] == 'teams.created' and json.loads(created['data']) == {'id': team_id, **team}
+    assert deleted['event'] == 'teams.deleted' and json.loads(deleted['data'])['id'] == team_id
+
+
+def test_bulk_update_events():
+    token = get_token()
+    team = {"name": "Name", "country": "Country", "city": "City", "stadium": "Stadium", "color": "Color", "coach": "Coach"}
+    team_id = client.post('/teams/', json=team, headers={"Authorization": token}).json()['id']
+    player = {"firstname": "Name", "lastname": "Lastname", "birthdate": "2000-01-01", "height": 1.80,
+              "nationality": "Colombia", "position": "Midfield", "dorsal": 5, "team_id": team_id}
+    player_id = client.post('/players/', json=player, headers={"Authorization": token}).json()['id']
+
+    async def receive():
+        subscriber, _ = events.subscribe(entities={'players'})
+        try:
+            await asyncio.to_thread(client.patch, '/players/bulk', json=[{"id": player_id, "dorsal": 10}],
+                                    headers={"Authorization": token})
+            return parse((await asyncio.wait_for(subscriber.queue.get(), 1)).message)
+        finally:
+            events.unsubscribe(subscriber)
+
+    updated = asyncio.run(receive())
+    # Same payload as the single updates: the full player.
+    assert updated['event'] == 'players.updated'
+    assert json.loads(updated['data']) == {**player, "dorsal": 10, "id": player_id}
+    client.delete(f'/players/{player_id}/', headers={"Authorization": token})
+    client.delete(f'/teams/{team_id}/', headers={"Authorization": token})
@@ -0,0 +1,76 @@
+"""
+Implements unit tests to the group commit writer.
+"""
+
+# Python imports.
+import pytest
+from concurrent.futures import Future
+from sqlalchemy import event
+from sqlmodel import Session, select
+
+# Project imports.
+from app.database.database import engine
+from app.database.group_commit import GroupCommitWriter
+from app.database.operations import teams as db_teams
+from app.database.operations.writes import after_commit
+from app.models import TeamBase, TeamDB, TeamUpdates
+
+
+team = TeamBase(name="Name", country="Country", city="City", stadium="Stadium", color="Color", coach="Coach")
+
+
+def delete_teams(team_ids):
+    with Session(engine) as session:
+        for team_db in session.exec(select(TeamDB).where(TeamDB.id.in_(team_ids))):
+            session.delete(team_db)
+        session.commit()
+
+
+def test_write_batch():
+    def create_and_fail(db):
+        db_teams.create_team(db, team)
+        raise ValueError('Failed write')
+
+    commits = []
+    listener = lambda connection: commits.append(connection)
+    event.listen(engine, 'commit', listener)
+    batch = [(db_teams.create_team, (team,), Future()), (create_and_fail, (), Future()), (db_teams.create_team, (team,), Future())]
+    try:
+        GroupCommitWriter(engine, window=0, max_batch=10).write_batch(batch)
+    finally:
+        event.remove(engine, 'commit', listener)
+
+    first, failed, last = (future for _, _, future in batch)
+    assert len(commits) == 1
+    with pytest.raises(ValueError, match='Failed write'):
+        failed.result()
+    team_ids = [first.result().id, last.result().id]
+    with Session(engine) as session:
+        # The team created by the failed write was rolled back with its savepoint.
+        assert session.exec(select(TeamDB.id).where(TeamDB.id > team_ids[0])).all() == [team_ids[1]]
+    delete_teams(team_ids)
+
+
+def test_writer_groups_concurrent_writes():
+    writer = GroupCommitWriter(engine, window=0.5, max_batch=3)
+    team_id = writer.submit(db_teams.create_team, team).result(timeout=5).id
+    futures = [writer.submit(db_teams.update_team, team_id, TeamUpdates(color=f'Color {number}')) for number in range(3)]
+    assert [future.result(timeout=5).color for future in futures] == ['Color 0', 'Color 1', 'Color 2']
+    assert writer.batches == 2
+    writer.stop()
+    with Session(engine) as session:
+        assert db_teams.get_team_by_id(session, team_id).color == 'Color 2'
+    delete_teams([team_id])
+
+
+def test_writer_survives_failed_callbacks():
+    def create_with_failed_callback(db):
+        after_commit(db, lambda: 1 / 0)
+        return db_teams.create_team(db, team)
+
+    writer = GroupCommitWriter(engine, window=0, max_batch=10)
+    first = writer.submit(create_with_failed_callback).result(timeout=5)
+    # The batch was committed and the writer still runs the next writes.
+    second = writer.submit(db_teams.create_team, team).result(timeout=5)
+    writer.stop()
+    delete_teams([first.id, second.id])
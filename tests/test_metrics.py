@@ -0,0 +1,28 @@
+"""
+Implements unit tests to the metrics endpoint.
+"""
+
+# Python imports.
+from fastapi.testclient import TestClient
+
+# Project imports.
+from app.main import app
+
+
+client = TestClient(app)
+
+
+def test_metrics():
+    client.get('/players/', params={'limit': 1})
+    client.get('/players/999999/')
+    response = client.get('/metrics')
+    assert response.status_code == 200
+    assert response.headers['content-type'].startswith('text/plain; version=0.0.4')
+
+    lines = response.text.splitlines()
+    assert any(line.startswith('http_requests_total{method="GET",route="/players/",status="200"} ') for line in lines)
+    assert any(line.startswith('http_requests_total{method="GET",route="/players/{player_id}/",status="404"} ') for line in lines)
+    assert any(line.startswith('http_request_duration_seconds_bucket{method="GET",route="/players/",le="+Inf"} ') for line in lines)
+    queries = next(line for line in lines if line.startswith('db_queries_total{method="GET",route="/players/"}'))
+    assert int(queries.split()[-1]) > 0
+    assert 'http_requests_in_progress{method="GET"} 1' in lines
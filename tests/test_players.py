@@ -7,11 +7,17 @@ from fastapi.testclient import TestClient
 from sqlmodel import Session
 
 # Project imports.
-import os
+import os, json
 from dotenv import load_dotenv
+from app import responses
 from app.main import app
 from app.database.database import engine
-from app.models import PlayerDB
+from app.database.cache import players_cache
+from app.database import instrumentation
+from app.database.instrumentation import count_queries, max_queries
+from app.database.operations import players as db_players
+from app.models import Player, PlayerDB, TeamDB
+from app.pagination import encode_cursor
 
 
 load_dotenv('.env')
@@ -57,6 +63,28 @@ def test_bad_create_player():
     assert response.json()['detail'][0]['msg'] == 'Field required'
 
 
+def test_create_players_bulk():
+    player_to_create = {"firstname": "Name", "lastname": "Lastname", "birthdate": "2000-01-01", "height": 1.80,
+                        "nationality": "Colombia", "position": "Midfield", "dorsal": 5, "team_id": 1}
+    response = client.post("/players/bulk", json=[player_to_create, {"firstname": "Name"}, player_to_create],
+                           headers={"Authorization": get_token()})
+    assert response.status_code == 201
+    assert len(response.json()['ids']) == 2
+    assert [error['index'] for error in response.json()['errors']] == [1]
+
+
+def test_create_players_bulk_ndjson():
+    player_to_create = {"firstname": "Name", "lastname": "Lastname", "birthdate": "2000-01-01", "height": 1.80,
+                        "nationality": "Colombia", "position": "Midfield", "dorsal": 5, "team_id": 1}
+    body = "\n".join([json.dumps(player_to_create), "{not json", json.dumps(player_to_create)])
+    response = client.post("/players/bulk", content=body,
+                           headers={"Authorization": get_token(), "Content-Type": "application/x-ndjson"})
+    assert response.status_code == 201
+    assert len(response.json()['ids']) == 2
+    assert response.json()['errors'][0]['index'] == 1
+    assert response.json()['errors'][0]['detail'][0]['type'] == 'json_invalid'
+
+
 def test_get_players():
     response = client.get('/players/')
     assert response.status_code == 200
@@ -69,6 +97,216 @@ def test_get_filtered_players():
     assert response.json() == []
 
 
+def test_search_players():
+    player_to_create = {"firstname": "Searchable", "lastname": "Zyxwvutsr", "birthdate": "2000-01-01", "height": 1.80,
+                        "nationality": "Colombia", "position": "Midfield", "dorsal": 5, "team_id": 1}
+    player_id = client.post("/players/", json=player_to_create, headers={"Authorization": get_token()}).json()['id']
+    for lastname in ('xwvut', 'XWVUT', 'Zy'):
+        response = client.get(f'/players/?lastname={lastname}')
+        assert response.status_code == 200
+        assert player_id in [player['id'] for player in response.json()]
+    client.delete(f'/players/{player_id}', headers={"Authorization": get_token()})
+
+
+def test_get_paginated_players():
+    token = get_token()
+    team = {"name": "Name", "country": "Country", "city": "City", "stadium": "Stadium", "color": "Color", "coach": "Coach"}
+    team_id = client.post('/teams/', json=team, headers={"Authorization": token}).json()['id']
+    player_to_create = {"firstname": "Name", "lastname": "Lastname", "birthdate": "2000-01-01", "height": 1.80,
+                        "nationality": "Colombia", "position": "Midfield", "dorsal": 5, "team_id": team_id}
+    player_ids = client.post("/players/bulk", json=[player_to_create] * 2, headers={"Authorization": token}).json()['ids']
+
+    first_page = client.get('/players/', params={'team_id': team_id, 'limit': 1})
+    assert first_page.status_code == 200
+    assert [player['id'] for player in first_page.json()] == [player_ids[0]]
+    cursor = first_page.headers.get('X-Next-Cursor')
+    assert cursor
+    second_page = client.get('/players/', params={'team_id': team_id, 'limit': 1, 'cursor': cursor})
+    assert second_page.status_code == 200
+    assert [player['id'] for player in second_page.json()] == [player_ids[1]]
+    for player_id in player_ids:
+        delete_created_db_record(PlayerDB, player_id)
+    delete_created_db_record(TeamDB, team_id)
+
+
+def test_bad_cursor_players():
+    response = client.get('/players/?cursor=not-a-cursor')
+    assert response.status_code == 400
+    assert response.json() == {"detail": "Invalid cursor"}
+
+
+def test_get_sorted_players():
+    token = get_token()
+    team = {"name": "Name", "country": "Country", "city": "City", "stadium": "Stadium", "color": "Color", "coach": "Coach"}
+    team_id = client.post('/teams/', json=team, headers={"Authorization": token}).json()['id']
+    players = [{"firstname": "Name", "lastname": "Lastname", "birthdate": birthdate, "height": height,
+                "nationality": "Colombia", "position": "Midfield", "dorsal": dorsal, "team_id": team_id}
+               for birthdate, height, dorsal in (("1995-05-01", 1.90, 9), ("2001-03-02", 1.86, 4),
+                                                 ("2003-07-08", 1.90, 7), ("2002-01-01", 1.70, 1))]
+    player_ids = client.post("/players/bulk", json=players, headers={"Authorization": token}).json()['ids']
+    client.delete(f'/players/{player_ids[3]}/', headers={"Authorization": token})
+
+    params = {'team_id': team_id, 'birthdate_min': '2000-01-01', 'height_min': 1.85, 'sort': '-height', 'limit': 1}
+    pages, cursor = [], None
+    while True:
+        response = client.get('/players/', params={**params, 'cursor': cursor, 'fields': 'dorsal'} if cursor else params)
+        assert response.status_code == 200
+        pages.append([player['id'] for player in response.json()])
+        if not (cursor := response.headers.get('X-Next-Cursor')):
+            break
+    assert pages == [[player_ids[2]], [player_ids[1]]]
+
+    response = client.get('/players/', params={'team_id': team_id, 'sort': 'dorsal', 'dorsal_max': 7})
+    assert [player['dorsal'] for player in response.json()] == [4, 7]
+    response = client.get('/players/', params={'team_id': team_id, 'is_active': False})
+    assert [player['id'] for player in response.json()] == [player_ids[3]]
+
+    cursor = client.get('/players/', params={'sort': 'height', 'limit': 1}).headers['X-Next-Cursor']
+    assert client.get('/players/', params={'sort': 'dorsal', 'cursor': cursor}).status_code == 400
+    assert client.get('/players/', params={'sort': 'nationality'}).status_code == 422
+    for player_id in player_ids:
+        delete_created_db_record(PlayerDB, player_id)
+    delete_created_db_record(TeamDB, team_id)
+
+
+def test_get_players_by_ids():
+    player_to_create = {"firstname": "Name", "lastname": "Lastname", "birthdate": "2000-01-01", "height": 1.80,
+                        "nationality": "Colombia", "position": "Midfield", "dorsal": 5, "team_id": 1}
+    player_ids = client.post("/players/bulk", json=[player_to_create] * 3, headers={"Authorization": get_token()}).json()['ids']
+    requested = [player_ids[2], 123456789, player_ids[0], player_ids[1], player_ids[0]]
+
+    with max_queries(1):
+        response = client.get('/players/', params={'ids': ','.join(map(str, requested))})
+    assert response.status_code == 200
+    assert [player['id'] for player in response.json()] == [player_ids[2], player_ids[0], player_ids[1]]
+    assert response.headers['X-Missing-Ids'] == '123456789'
+
+    with Session(engine) as session:
+        players = db_players.get_players_by_ids(session, [player_ids[0], player_ids[1], 123456789, player_ids[2]], chunk_size=2)
+    assert [player.id for player in players] == [player_ids[0], player_ids[1], player_ids[2]]
+    for player_id in player_ids:
+        delete_created_db_record(PlayerDB, player_id)
+
+
+def test_bad_get_players_by_ids():
+    response = client.get('/players/', params={'ids': '1,two'})
+    assert response.status_code == 400
+    assert response.json() == {"detail": "Invalid ids"}
+
+
+def test_export_players():
+    response = client.get('/players/export?format=ndjson')
+    assert response.status_code == 200
+    assert response.headers['content-type'].startswith('application/x-ndjson')
+    players = [json.loads(line) for line in response.text.splitlines()]
+    assert all(set(player) == set(Player.model_fields) for player in players)
+
+
+def test_export_filtered_players_csv():
+    response = client.get('/players/export?format=csv&nationality=jupiter')
+    assert response.status_code == 200
+    assert response.text.splitlines() == [','.join(Player.model_fields)]
+
+
+def test_get_players_fast_responses(monkeypatch):
+    expected = client.get('/players/?limit=5')
+    monkeypatch.setattr(responses, 'FAST_RESPONSES', True)
+    response = client.get('/players/?limit=5')
+    assert response.status_code == 200
+    assert response.json() == expected.json()
+    assert response.headers['ETag'] == expected.headers['ETag']
+
+
+def test_query_profiling(monkeypatch, caplog):
+    response = client.get('/players/?limit=5')
+    assert int(response.headers['X-Query-Count']) >= 1
+    assert float(response.headers['X-DB-Time']) > 0
+
+    monkeypatch.setattr(instrumentation, 'QUERY_PROFILING', True)
+    monkeypatch.setattr(instrumentation, 'SLOW_QUERY_THRESHOLD', 0)
+    with caplog.at_level('WARNING', logger=instrumentation.__name__):
+        client.get('/players/?limit=5')
+    assert 'Slow query' in caplog.text
+    assert 'SCAN players' in caplog.text or 'SEARCH players' in caplog.text
+
+
+def test_get_players_fields():
+    with count_queries() as stats:
+        response = client.get('/players/', params={'limit': 2, 'fields': 'lastname,dorsal'})
+    assert response.status_code == 200
+    assert all(list(player) == ['id', 'lastname', 'dorsal'] for player in response.json())
+    assert 'firstname' not in next(statement for statement in stats.statements if 'FROM players' in statement)
+
+    player_id = response.json()[0]['id']
+    assert client.get(f'/players/{player_id}/', params={'fields': 'firstname'}).json().keys() == {'id', 'firstname'}
+
+
+def test_get_players_only_id():
+    token = get_token()
+    team = {"name": "Name", "country": "Country", "city": "City", "stadium": "Stadium", "color": "Color", "coach": "Coach"}
+    team_id = client.post('/teams/', json=team, headers={"Authorization": token}).json()['id']
+    player_to_create = {"firstname": "Name", "lastname": "Lastname", "birthdate": "2000-01-01", "height": 1.80,
+                        "nationality": "Colombia", "position": "Midfield", "dorsal": 5, "team_id": team_id}
+    player_ids = client.post("/players/bulk", json=[player_to_create] * 2, headers={"Authorization": token}).json()['ids']
+
+    # A projection of only the id (an empty one always has the id) returns objects with the id, not plain values.
+    first_page = client.get('/players/', params={'team_id': team_id, 'limit': 1, 'fields': 'id'})
+    assert first_page.status_code == 200
+    assert first_page.json() == [{'id': player_ids[0]}]
+    cursor = first_page.headers['X-Next-Cursor']
+    second_page = client.get('/players/', params={'team_id': team_id, 'limit': 1, 'fields': '', 'cursor': cursor})
+    assert second_page.status_code == 200
+    assert second_page.json() == [{'id': player_ids[1]}]
+    for player_id in player_ids:
+        delete_created_db_record(PlayerDB, player_id)
+    delete_created_db_record(TeamDB, team_id)
+
+
+def test_get_players_by_ids_only_id():
+    player_to_create = {"firstname": "Name", "lastname": "Lastname", "birthdate": "2000-01-01", "height": 1.80,
+                        "nationality": "Colombia", "position": "Midfield", "dorsal": 5, "team_id": 1}
+    player_ids = client.post("/players/bulk", json=[player_to_create] * 2, headers={"Authorization": get_token()}).json()['ids']
+    response = client.get('/players/', params={'ids': f'{player_ids[1]},123456789,{player_ids[0]}', 'fields': 'id'})
+    assert response.status_code == 200
+    assert response.json() == [{'id': player_ids[1]}, {'id': player_ids[0]}]
+    assert response.headers['X-Missing-Ids'] == '123456789'
+    for player_id in player_ids:
+        delete_created_db_record(PlayerDB, player_id)
+
+
+def test_bad_get_players_fields():
+    response = client.get('/players/', params={'fields': 'lastname,salary'})
+    assert response.status_code == 400
+    assert response.json() == {"detail": "Invalid fields: salary"}
+
+
+def test_get_player_changes():
+    response = client.get('/players/changes', params={'limit': 1000})
+    while response.headers['X-Has-More'] == 'true':
+        response = client.get('/players/changes', params={'limit': 1000, 'since': response.headers['X-Next-Cursor']})
+    since = response.headers['X-Next-Cursor']
+
+    token = get_token()
+    player_to_create = {"firstname": "Name", "lastname": "Lastname", "birthdate": "2000-01-01", "height": 1.80,
+                        "nationality": "Colombia", "position": "Midfield", "dorsal": 5, "team_id": 1}
+    player_ids = client.post("/players/bulk", json=[player_to_create] * 2, headers={"Authorization": token}).json()['ids']
+    client.patch(f'/players/{player_ids[0]}/', json={"dorsal": 9}, headers={"Authorization": token})
+    client.delete(f'/players/{player_ids[1]}/', headers={"Authorization": token})
+
+    response = client.get('/players/changes', params={'since': since})
+    assert response.status_code == 200
+    changes = response.json()
+    assert [(player['id'], player['dorsal'], player['is_active']) for player in changes] == [(player_ids[0], 9, True), (player_ids[1], 5, False)]
+    assert response.headers['X-Has-More'] == 'false'
+
+    response = client.get('/players/changes', params={'since': response.headers['X-Next-Cursor']})
+    assert response.json() == []
+    assert response.headers['X-Next-Cursor']
+    assert client.get('/players/changes', params={'since': encode_cursor({'id': 1})}).status_code == 400
+    for player_id in player_ids:
+        delete_created_db_record(PlayerDB, player_id)
+
+
 def test_get_player_by_id():
     player_id = client.get('/players/').json()[0]['id']
     response = client.get(f'/players/{player_id}')
@@ -76,6 +314,17 @@ def test_get_player_by_id():
     assert response.json()['id'] == player_id
     
 
+def test_get_player_by_id_cached():
+    player_id = client.get('/players/').json()[0]['id']
+    client.get(f'/players/{player_id}')
+    hits = players_cache.stats()['hits']
+    assert client.get(f'/players/{player_id}').json()['id'] == player_id
+    assert players_cache.stats()['hits'] == hits + 1
+
+    client.patch(f'/players/{player_id}', json={"position": "Goalkeeper"}, headers={"Authorization": get_token()})
+    assert client.get(f'/players/{player_id}').json()['position'] == "Goalkeeper"
+
+
 def test_bad_get_player_by_id():
     response = client.get('/players/1234241234123451')
     assert response.status_code == 404
@@ -92,6 +341,48 @@ def test_update_player():
     assert response.json()['id'] == player_id
 
 
+def test_update_player_queries():
+    player_id = client.get('/players/').json()[0]['id']
+    update_data = {"firstname": "Name updated", "lastname": "Lastname updated"}
+    token = get_token()
+    # The update returns the row in the same statement, without selecting it before or after.
+    with max_queries(1):
+        response = client.patch(f'/players/{player_id}/', json=update_data, headers={"Authorization": token})
+    assert response.status_code == 200
+    assert client.get(f'/players/{player_id}/').json()['firstname'] == "Name updated"
+
+    response = client.patch('/players/1234241234123451/', json=update_data, headers={"Authorization": token})
+    assert response.status_code == 404
+
+
+def test_update_players_bulk():
+    token = get_token()
+    team = {"name": "Team", "country": "Colombia", "city": "Cali", "stadium": "Stadium", "color": "Green", "coach": "Coach"}
+    old_team_id, team_id = client.post('/teams/bulk', json=[team] * 2, headers={"Authorization": token}).json()['ids']
+    player_to_create = {"firstname": "Name", "lastname": "Lastname", "birthdate": "2000-01-01", "height": 1.80,
+                        "nationality": "Colombia", "position": "Midfield", "dorsal": 5, "team_id": old_team_id}
+    player_ids = client.post("/players/bulk", json=[player_to_create] * 3, headers={"Authorization": token}).json()['ids']
+
+    updates = [{"id": player_ids[0], "team_id": team_id}, {"id": player_ids[1], "team_id": team_id},
+               {"id": player_ids[2], "dorsal": 10}, {"id": 123456789, "dorsal": 10}]
+    # One query checks the target team and one UPDATE runs per distinct set of changes.
+    with max_queries(3):
+        response = client.patch('/players/bulk', json=updates, headers={"Authorization": token})
+    assert response.status_code == 200
+    assert response.json() == {"ids": player_ids, "missing": [123456789]}
+    assert [player['team_id'] for player in client.get('/players/', params={'ids': ','.join(map(str, player_ids))}).json()] == [team_id, team_id, old_team_id]
+
+    response = client.patch('/players/bulk', json=[{"id": player_ids[2], "team_id": 987654321}], headers={"Authorization": token})
+    assert response.status_code == 422
+    assert response.json() == {"detail": "Team not found: 987654321"}
+    assert client.get(f'/players/{player_ids[2]}/').json()['team_id'] == old_team_id
+
+    for player_id in player_ids:
+        delete_created_db_record(PlayerDB, player_id)
+    for deleted_team_id in (old_team_id, team_id):
+        client.delete(f'/teams/{deleted_team_id}/', headers={"Authorization": token})
+
+
 def test_delete_player():
     player_id = client.get('/players/').json()[0]['id']
     response = client.delete(f'/players/{player_id}', headers={"Authorization": get_token()})
@@ -0,0 +1,20 @@
+"""
+Implements unit tests to stats router.
+"""
+
+# Python imports.
+from fastapi.testclient import TestClient
+
+# Project imports.
+from app.main import app
+
+
+client = TestClient(app)
+
+
+def test_get_league_stats():
+    response = client.get('/stats/')
+    assert response.status_code == 200
+    stats = response.json()
+    assert sum(stats['positions'].values()) == stats['player_count']
+    assert sum(stats['ages'].values()) == stats['player_count']
@@ -11,7 +11,9 @@ from sqlmodel import Session
 # Project imports.
 from app.main import app
 from app.database.database import engine
-from app.models import TeamDB
+from app.database.instrumentation import max_queries
+from app.database.operations.bulk import insert_in_chunks
+from app.models import Team, TeamDB
 
 
 load_dotenv('.env')
@@ -50,6 +52,27 @@ def test_bad_create_team():
     assert response.json()['detail'][0]['msg'] == 'Field required'
 
 
+def test_create_teams_bulk():
+    team_to_create = {"name": "Name", "country": "Country", "city": "City", "stadium": "Stadium", "color": "Color", "coach": "Coach"}
+    response = client.post("/teams/bulk", json=[team_to_create, team_to_create], headers={"Authorization": get_token()})
+    assert response.status_code == 201
+    assert len(response.json()['ids']) == 2
+    assert response.json()['errors'] == []
+
+
+def test_insert_in_chunks_row_errors():
+    team = {"name": "Name", "country": "Country", "city": "City", "stadium": "Stadium", "color": "Color", "coach": "Coach",
+            "is_active": True}
+    rows = [team, {**team, "name": None}, team, team]
+    with Session(engine) as session:
+        ids, errors = insert_in_chunks(session, TeamDB, rows, chunk_size=3)
+    # Only the invalid row fails, the other rows of its chunk are inserted.
+    assert sorted(ids) == [0, 2, 3]
+    assert list(errors) == [1] and 'NOT NULL' in errors[1]
+    for team_id in ids.values():
+        delete_created_db_record(TeamDB, team_id)
+
+
 def test_get_teams():
     response = client.get('/teams/')
     assert response.status_code == 200
@@ -62,6 +85,66 @@ def test_get_filtered_teams():
     assert response.json() == []
 
 
+def test_get_paginated_teams():
+    team = {"name": "Paginated", "country": "Country", "city": "City", "stadium": "Stadium", "color": "Color", "coach": "Coach"}
+    team_ids = client.post('/teams/bulk', json=[team] * 2, headers={"Authorization": get_token()}).json()['ids']
+
+    first_page = client.get('/teams/', params={'name': 'Paginated', 'limit': 1})
+    assert first_page.status_code == 200
+    assert [team['id'] for team in first_page.json()] == [team_ids[0]]
+    cursor = first_page.headers.get('X-Next-Cursor')
+    assert cursor
+    second_page = client.get('/teams/', params={'name': 'Paginated', 'limit': 1, 'cursor': cursor})
+    assert second_page.status_code == 200
+    assert [team['id'] for team in second_page.json()] == [team_ids[1]]
+    for team_id in team_ids:
+        delete_created_db_record(TeamDB, team_id)
+
+
+def test_get_sorted_teams():
+    token = get_token()
+    team = {"country": "Country", "city": "City", "stadium": "Stadium", "color": "Color", "coach": "Coach"}
+    team_ids = client.post('/teams/bulk', json=[{**team, "name": name} for name in ("Sortable B", "Sortable A", "Sortable C")],
+                           headers={"Authorization": token}).json()['ids']
+    first_page = client.get('/teams/', params={'name': 'Sortable', 'sort': '-name', 'limit': 2})
+    assert [team['name'] for team in first_page.json()] == ["Sortable C", "Sortable B"]
+    second_page = client.get('/teams/', params={'name': 'Sortable', 'sort': '-name', 'limit': 2,
+                                                'cursor': first_page.headers['X-Next-Cursor']})
+    assert [team['id'] for team in second_page.json()] == [team_ids[1]]
+    assert 'X-Next-Cursor' not in second_page.headers
+    for team_id in team_ids:
+        delete_created_db_record(TeamDB, team_id)
+
+
+def test_export_teams_csv():
+    response = client.get('/teams/export?format=csv')
+    assert response.status_code == 200
+    assert response.headers['content-type'].startswith('text/csv')
+    assert response.text.splitlines()[0] == ','.join(Team.model_fields)
+
+
+def test_get_teams_not_modified():
+    response = client.get('/teams/')
+    etag = response.headers['ETag']
+    not_modified = client.get('/teams/', headers={"If-None-Match": etag})
+    assert not_modified.status_code == 304
+    assert not_modified.content == b''
+    assert not_modified.headers['ETag'] == etag
+
+    team_to_create = {"name": "Name", "country": "Country", "city": "City", "stadium": "Stadium", "color": "Color", "coach": "Coach"}
+    client.post("/teams/", json=team_to_create, headers={"Authorization": get_token()})
+    modified = client.get('/teams/', headers={"If-None-Match": etag})
+    assert modified.status_code == 200
+    assert modified.headers['ETag'] != etag
+
+
+def test_get_team_changes():
+    response = client.get('/teams/changes', params={'limit': 2})
+    assert response.status_code == 200
+    assert all(team['updated_at'] and team['change_seq'] for team in response.json())
+    assert response.headers['X-Next-Cursor']
+
+
 def test_get_team_by_id():
     team_id = client.get('/teams/').json()[0]['id']
     response = client.get(f'/teams/{team_id}')
@@ -75,6 +158,14 @@ def test_bad_get_team_by_id():
     assert response.json() == {"detail": "Team not found"}
 
 
+def test_get_missing_team_not_modified():
+    response = client.get('/teams/1234241234123451/')
+    assert response.status_code == 404
+    assert 'ETag' not in response.headers
+    response = client.get('/teams/1234241234123451/', headers={'If-None-Match': '*'})
+    assert response.status_code == 404
+
+
 def test_update_team():
     team_id = client.get('/teams/').json()[0]['id']
     update_data = {"city": "London", "color": "Red/White"}
@@ -92,6 +183,92 @@ def test_get_players_by_team_id():
     assert isinstance(response.json(), list)
 
 
+def test_get_teams_with_players():
+    team_id = client.get('/teams/').json()[0]['id']
+    player_to_create = {"firstname": "Name", "lastname": "Lastname", "birthdate": "2000-01-01", "height": 1.80,
+                        "nationality": "Colombia", "position": "Midfield", "dorsal": 5, "team_id": team_id}
+    player_ids = client.post("/players/bulk", json=[player_to_create] * 2, headers={"Authorization": get_token()}).json()['ids']
+    client.delete(f'/players/{player_ids[1]}', headers={"Authorization": get_token()})
+
+    # Players of all the teams are loaded with one query, never one per team.
+    with max_queries(2):
+        teams = client.get('/teams/?include=players').json()
+    team = next(team for team in teams if team['id'] == team_id)
+    assert player_ids[0] in [player['id'] for player in team['players']]
+    assert player_ids[1] not in [player['id'] for player in team['players']]
+    assert 'players' not in client.get('/teams/').json()[0]
+
+    with max_queries(2):
+        response = client.get(f'/teams/{team_id}/?include=players')
+    assert response.status_code == 200
+    assert [player['id'] for player in response.json()['players']] == [player['id'] for player in team['players']]
+    assert [player['id'] for player in client.get(f'/teams/{team_id}/players').json()] == [player['id'] for player in team['players']]
+
+
+def test_get_teams_by_ids():
+    team_ids = [team['id'] for team in client.get('/teams/', params={'limit': 2}).json()]
+    response = client.get('/teams/', params={'ids': f'{team_ids[-1]},987654321,{team_ids[0]}', 'include': 'players'})
+    assert response.status_code == 200
+    assert [team['id'] for team in response.json()] == [team_ids[-1], team_ids[0]]
+    assert all('players' in team for team in response.json())
+    assert response.headers['X-Missing-Ids'] == '987654321'
+
+
+def test_get_teams_fields():
+    response = client.get('/teams/', params={'limit': 2, 'fields': 'name', 'include': 'players'})
+    assert response.status_code == 200
+    assert all(list(team) == ['id', 'name', 'players'] for team in response.json())
+
+    team_id = response.json()[0]['id']
+    assert client.get(f'/teams/{team_id}/', params={'fields': 'city,country'}).json().keys() == {'id', 'city', 'country'}
+
+
+def test_get_teams_only_id():
+    team = {"name": "Only id", "country": "Country", "city": "City", "stadium": "Stadium", "color": "Color", "coach": "Coach"}
+    team_ids = client.post('/teams/bulk', json=[team] * 2, headers={"Authorization": get_token()}).json()['ids']
+
+    first_page = client.get('/teams/', params={'name': 'Only id', 'limit': 1, 'fields': 'id'})
+    assert first_page.status_code == 200
+    assert first_page.json() == [{'id': team_ids[0]}]
+    cursor = first_page.headers['X-Next-Cursor']
+    second_page = client.get('/teams/', params={'name': 'Only id', 'limit': 1, 'fields': '', 'cursor': cursor})
+    assert second_page.status_code == 200
+    assert second_page.json() == [{'id': team_ids[1]}]
+    for team_id in team_ids:
+        delete_created_db_record(TeamDB, team_id)
+
+
+def test_get_teams_by_ids_only_id():
+    team = {"name": "Name", "country": "Country", "city": "City", "stadium": "Stadium", "color": "Color", "coach": "Coach"}
+    team_ids = client.post('/teams/bulk', json=[team] * 2, headers={"Authorization": get_token()}).json()['ids']
+    response = client.get('/teams/', params={'ids': f'{team_ids[1]},987654321,{team_ids[0]}', 'fields': 'id'})
+    assert response.status_code == 200
+    assert response.json() == [{'id': team_ids[1]}, {'id': team_ids[0]}]
+    assert response.headers['X-Missing-Ids'] == '987654321'
+    for team_id in team_ids:
+        delete_created_db_record(TeamDB, team_id)
+
+
+def test_get_team_stats():
+    team_id = client.get('/teams/').json()[0]['id']
+    stats = client.get(f'/teams/{team_id}/stats').json()
+    player_to_create = {"firstname": "Name", "lastname": "Lastname", "birthdate": "2000-01-01", "height": 1.80,
+                        "nationality": "Narnia", "position": "Midfield", "dorsal": 99, "team_id": team_id}
+    client.post("/players/", json=player_to_create, headers={"Authorization": get_token()})
+
+    response = client.get(f'/teams/{team_id}/stats')
+    assert response.status_code == 200
+    assert response.json()['player_count'] == stats['player_count'] + 1
+    assert response.json()['nationalities']['Narnia'] == stats['nationalities'].get('Narnia', 0) + 1
+    assert response.json()['dorsals']['99'] == stats['dorsals'].get('99', 0) + 1
+
+
+def test_bad_get_team_stats():
+    response = client.get('/teams/1234241234123451/stats')
+    assert response.status_code == 404
+    assert response.json() == {"detail": "Team not found"}
+
+
 def test_delete_team():
     team_id = client.get('/teams/').json()[0]['id']
     response = client.delete(f'/teams/{team_id}', headers={"Authorization": get_token()})